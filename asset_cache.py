@@ -0,0 +1,344 @@
+import cv2
+import numpy as np
+from PIL import Image
+import math
+import os
+from collections import OrderedDict
+
+from compositing import AlphaRegions, premultiply_alpha
+
+#In-memory caches for decoded assets used by csv_pipeline.py
+
+def _sizeof(value):
+    return getattr(value, "nbytes", 0)
+
+class LRUCache:
+    """
+    Small least-recently-used cache with hit/miss counters.
+
+    Evicts by entry count and, if max_bytes is set, by the total nbytes of the
+    cached values.
+    """
+    def __init__(self, max_entries=16, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        if key in self._entries:
+            self.nbytes -= _sizeof(self._entries[key])
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self.nbytes += _sizeof(value)
+        self._evict()
+
+    def limit(self, max_bytes):
+        """
+        Change the byte budget, evicting least recently used entries to fit it.
+        """
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def _evict(self):
+        # Always keep the newest entry, even if it alone is over the byte budget
+        while len(self._entries) > 1 and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= _sizeof(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.nbytes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+# Same 21x21 Gaussian the light map wrap has always used
+LIGHT_MAP_BLUR = (21, 21)
+
+class DecodedGarment:
+    """
+    A garment decoded once: RGBA pixels, a contiguous BGR copy for OpenCV and
+    the alpha plane used as the output mask. With light map wrapping the
+    grayscale plane and its blurred (float32) light plane are added once by
+    ensure_light_planes(). All arrays are read-only. alpha_regions (the
+    mask's AlphaRegions, used to flatten renders onto white) is built on first use.
+    """
+    PLANES = ("rgba", "bgr", "alpha", "gray", "light")
+
+    def __init__(self, rgba, bgr, alpha, gray=None, light=None):
+        self.rgba = rgba
+        self.bgr = bgr
+        self.alpha = alpha
+        self.gray = gray
+        self.light = light
+        self._alpha_regions = None
+        for plane in self.planes().values():
+            plane.flags.writeable = False
+
+    @classmethod
+    def from_rgba(cls, rgba):
+        rgba = np.asarray(rgba, dtype=np.uint8)
+        bgr = np.ascontiguousarray(rgba[:, :, 2::-1])  # Drop alpha and flip RGB -> BGR
+        alpha = np.ascontiguousarray(rgba[:, :, 3])
+        return cls(rgba, bgr, alpha)
+
+    @classmethod
+    def from_file(cls, path):
+        return cls.from_rgba(np.array(Image.open(path).convert("RGBA")))
+
+    @property
+    def width(self):
+        return self.rgba.shape[1]
+
+    @property
+    def height(self):
+        return self.rgba.shape[0]
+
+    @property
+    def nbytes(self):
+        return sum(plane.nbytes for plane in self.planes().values())
+
+    def planes(self):
+        return {name: getattr(self, name) for name in self.PLANES if getattr(self, name) is not None}
+
+    @property
+    def alpha_regions(self):
+        if self._alpha_regions is None:
+            self._alpha_regions = AlphaRegions.from_alpha(self.alpha)
+        return self._alpha_regions
+
+    def ensure_light_planes(self):
+        """
+        Compute the grayscale and blurred light planes for the whole garment once.
+        """
+        if self.light is None:
+            gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+            light = cv2.GaussianBlur(gray.astype(np.float32), LIGHT_MAP_BLUR, 0)
+            gray.flags.writeable = False
+            light.flags.writeable = False
+            self.gray, self.light = gray, light
+        return self
+
+    def image(self):
+        """
+        RGBA PIL image over the cached pixels (for the PIL-based helpers).
+        """
+        return Image.fromarray(self.rgba)
+
+    def alpha_image(self):
+        return Image.fromarray(self.alpha)
+
+class GarmentCache(LRUCache):
+    """
+    LRU cache of DecodedGarment keyed by (path, mtime) so edited PNGs are re-decoded.
+    With an asset store (see asset_store.AssetStore) set, up-to-date garments are
+    memory-mapped from it instead of decoded.
+    """
+    def __init__(self, max_entries=16, max_bytes=None, store=None):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+        self.store = store
+
+    def load(self, path):
+        key = (path, os.stat(path).st_mtime_ns)
+        garment = self.get(key)
+        if garment is None:
+            garment = self.store.garment(path) if self.store is not None else None
+            if garment is None:
+                garment = DecodedGarment.from_file(path)
+            self.put(key, garment)
+        return garment
+
+class ResizedGraphic:
+    """
+    A design resized to its print width and split the way overlay_logo blends it:
+    BGR pixels pre-multiplied by alpha, the 8-bit alpha plane and its
+    transparent / opaque / edge tiles (AlphaRegions). Read-only.
+
+    The planes may cover only the non-transparent part of the design: offset is
+    where they sit inside the full width x height rectangle, which is what the
+    logo is placed and light-mapped by.
+    """
+    def __init__(self, premult_bgr, alpha, regions=None, offset=(0, 0), size=None):
+        self.premult_bgr = premult_bgr
+        self.alpha = alpha
+        self.regions = regions if regions is not None else AlphaRegions.from_alpha(alpha)
+        self.offset = offset
+        self.size = size if size is not None else (alpha.shape[1], alpha.shape[0])
+        premult_bgr.flags.writeable = False
+        alpha.flags.writeable = False
+
+    @classmethod
+    def from_image(cls, logo_img, offset=(0, 0), size=None):
+        logo = np.array(logo_img.convert("RGBA"))  # Keep alpha (transparency)
+        alpha = np.ascontiguousarray(logo[:, :, 3])
+        logo_bgr = logo[:, :, :3][:, :, ::-1]  # Convert logo to BGR
+        # Pre-multiply the BGR values by the alpha channel
+        return cls(premultiply_alpha(logo_bgr, alpha), alpha, offset=offset, size=size)
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    @property
+    def nbytes(self):
+        return self.premult_bgr.nbytes + self.alpha.nbytes
+
+# Filter radius of Pillow's resampling filters in source pixels at 1:1 (NEAREST is not trimmed)
+RESAMPLE_SUPPORT = {
+    Image.Resampling.BOX: 0.5,
+    Image.Resampling.BILINEAR: 1.0,
+    Image.Resampling.HAMMING: 1.0,
+    Image.Resampling.BICUBIC: 2.0,
+    Image.Resampling.LANCZOS: 3.0,
+}
+
+def resample_span(lo, hi, full, out, support):
+    """
+    For one axis of a resize from full to out pixels whose content lies in
+    source pixels [lo, hi): the output span [out0, out1) that can be
+    non-transparent and the source span [src0, src1) needed to compute it.
+
+    Pillow keeps resize boxes as float32, so an arbitrary box resamples with
+    slightly different filter taps than the full resize. out0 and out1 are
+    therefore kept on multiples of out / gcd(full, out) output pixels, where
+    the box edges fall on whole source pixels and the taps are the same.
+    """
+    scale = full / out
+    support = support * max(scale, 1.0)
+    step = out // math.gcd(full, out)
+    centers = (np.arange(out) + 0.5) * scale
+    window_min = np.maximum((centers - support + 0.5).astype(np.int64), 0)
+    window_max = np.minimum((centers + support + 0.5).astype(np.int64), full)
+    hit = np.flatnonzero((window_min < hi) & (window_max > lo))
+    if not len(hit):
+        return 0, out, 0, full
+    # Output pixels at the start of the span have clipped filter windows: keep them clear of the content
+    first = hit[0] - math.ceil(support / scale) - 2
+    out0 = max(0, (first // step) * step)
+    out1 = min(out, -(-(hit[-1] + 1) // step) * step)
+    src0 = out0 * full // out
+    src1 = min(full, out1 * full // out + math.ceil(support) + 2)
+    return out0, out1, src0, src1
+
+class TrimmedGraphic:
+    """
+    A design decoded once and cut down to its alpha bounding box: the RGBA
+    pixels inside bbox (left, top, right, bottom) and the full size.
+    resize() gives the same pixels as resizing the untrimmed design but only
+    resamples (and returns) the part that is not transparent.
+    """
+    def __init__(self, rgba, bbox, size):
+        self.rgba = rgba
+        self.bbox = bbox
+        self.size = size
+        rgba.flags.writeable = False
+
+    @classmethod
+    def from_image(cls, graphic_img):
+        graphic_img = graphic_img.convert("RGBA")
+        # A fully transparent design keeps one (transparent) pixel
+        bbox = graphic_img.getchannel("A").getbbox() or (0, 0, 1, 1)
+        return cls(np.array(graphic_img.crop(bbox)), bbox, graphic_img.size)
+
+    @classmethod
+    def from_file(cls, path):
+        with Image.open(path) as graphic_img:
+            return cls.from_image(graphic_img)
+
+    @property
+    def nbytes(self):
+        return self.rgba.nbytes
+
+    def resize(self, width, resample=Image.Resampling.LANCZOS):
+        full_w, full_h = self.size
+        left, top, right, bottom = self.bbox
+        # Keep the design's aspect ratio at the requested width
+        height = int(width * (full_h / full_w))
+        if (width, height) == self.size:
+            # 1:1 is a copy in Pillow; resampling the canvas would not be exact
+            return ResizedGraphic.from_image(Image.fromarray(self.rgba), offset=(left, top), size=self.size)
+
+        support = RESAMPLE_SUPPORT.get(resample)
+        if support is None:
+            x0, x1, s0, s1 = 0, width, 0, full_w
+            y0, y1, t0, t1 = 0, height, 0, full_h
+        else:
+            x0, x1, s0, s1 = resample_span(left, right, full_w, width, support)
+            y0, y1, t0, t1 = resample_span(top, bottom, full_h, height, support)
+
+        # Transparent margin back around the content, only as far as the filter reaches
+        canvas = Image.new("RGBA", (s1 - s0, t1 - t0), (0, 0, 0, 0))
+        canvas.paste(Image.fromarray(self.rgba), (left - s0, top - t0))
+        box = (0, 0, x1 * full_w // width - s0, y1 * full_h // height - t0)
+        resized = canvas.resize((x1 - x0, y1 - y0), resample, box=box)
+
+        # Cut the resized pixels down to their own alpha bounding box
+        crop = resized.getchannel("A").getbbox() or (0, 0, 1, 1)
+        return ResizedGraphic.from_image(
+            resized.crop(crop), offset=(x0 + crop[0], y0 + crop[1]), size=(width, height)
+        )
+
+class GraphicCache(LRUCache):
+    """
+    LRU cache of ResizedGraphic keyed by (path, mtime, width, resampling mode),
+    bounded by total bytes. Designs are decoded and trimmed once into a second
+    LRU of TrimmedGraphic (the full-size decode is not kept), so a new width
+    only resizes the trimmed pixels. With an asset store set, up-to-date
+    trimmed designs are memory-mapped from it instead of decoded.
+    """
+    def __init__(self, max_entries=None, max_bytes=128 * 1024 * 1024, max_source_bytes=256 * 1024 * 1024, store=None):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+        self.sources = LRUCache(max_entries=None, max_bytes=max_source_bytes)
+        self.store = store
+
+    def source(self, path):
+        key = (path, os.stat(path).st_mtime_ns)
+        trimmed = self.sources.get(key)
+        if trimmed is None:
+            trimmed = self.store.graphic(path) if self.store is not None else None
+            if trimmed is None:
+                trimmed = TrimmedGraphic.from_file(path)
+            self.sources.put(key, trimmed)
+        return trimmed
+
+    def load(self, path, width, resample=Image.Resampling.LANCZOS):
+        key = (path, os.stat(path).st_mtime_ns, width, int(resample))
+        graphic = self.get(key)
+        if graphic is None:
+            graphic = self.source(path).resize(width, resample)
+            self.put(key, graphic)
+        return graphic
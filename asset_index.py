@@ -0,0 +1,76 @@
+import os
+
+#Case-insensitive index of an asset folder built with one os.scandir walk, so a job
+#sheet's Design / Garment values resolve with a dict lookup instead of os.path.exists.
+
+# Extensions looked up, in order of preference when one name has several files
+ASSET_EXTENSIONS = (".png", ".webp", ".tif", ".tiff", ".jpg", ".jpeg")
+
+def normalize_name(name):
+    """
+    Index key for an asset name: case-folded, '/' separated, surrounding spaces removed.
+    """
+    return str(name).strip().replace("\\", "/").casefold()
+
+def _is_file(entry):
+    # A symlink is followed here; broken or looping links are not files
+    try:
+        return entry.is_file()
+    except OSError:
+        return False
+
+class AssetIndex:
+    """
+    Map normalized asset names to real file paths for one folder (and its
+    subfolders). Each file is found by its name without extension and by its
+    path relative to the folder, with or without extension. Files directly
+    in the folder win over nested ones and earlier ASSET_EXTENSIONS win over
+    later ones; otherwise the first path in sorted order wins. Symlinked
+    files are indexed but symlinked subfolders are not walked (so a link
+    cannot loop), and a subfolder that cannot be read is skipped.
+    """
+    def __init__(self, folder, extensions=ASSET_EXTENSIONS, recursive=True):
+        self.folder = folder
+        self.extensions = tuple(ext.casefold() for ext in extensions)
+        self.files = 0
+        self._paths = {}
+        self._ranks = {}
+        self._scan(recursive)
+
+    def __len__(self):
+        return self.files
+
+    def __contains__(self, name):
+        return self.resolve(name) is not None
+
+    def _scan(self, recursive):
+        pending = [(self.folder, "", 0)]
+        while pending:
+            folder, prefix, depth = pending.pop()
+            try:
+                entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+            except OSError:  # Missing, not a folder or not readable
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending.append((entry.path, f"{prefix}{entry.name}/", depth + 1))
+                    continue
+                stem, ext = os.path.splitext(entry.name)
+                if ext.casefold() not in self.extensions or not _is_file(entry):
+                    continue
+                self.files += 1
+                rank = (depth, self.extensions.index(ext.casefold()), prefix + entry.name)
+                for key in {stem, prefix + stem, prefix + entry.name}:
+                    self._add(normalize_name(key), entry.path, rank)
+
+    def _add(self, key, path, rank):
+        if key not in self._ranks or rank < self._ranks[key]:
+            self._paths[key] = path
+            self._ranks[key] = rank
+
+    def resolve(self, name):
+        """
+        Real path for an asset name (e.g. a sheet's Design value), or None.
+        """
+        return self._paths.get(normalize_name(name))
@@ -0,0 +1,257 @@
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+
+from asset_cache import DecodedGarment, TrimmedGraphic
+
+#Pre-decoded asset store: garment and design PNGs converted once into raw .npy planes
+#that renderers memory-map (np.load(mmap_mode="r")) instead of inflating the PNG again.
+#<store>/index.json maps each source PNG to its planes and the size/mtime they were built
+#from; build() only converts files that are new or changed. Processes mapping the same
+#planes share them through the OS page cache. The store is bounded by total plane bytes:
+#least recently used entries are removed when a build goes over it.
+#TO RUN: python asset_store.py --graphics Graphics --garments Garments --light-planes
+
+# Bump when the stored planes change (forces a full rebuild)
+STORE_VERSION = 1
+
+INDEX_NAME = "index.json"
+
+def _source_stat(path):
+    source = os.stat(path)
+    return source.st_size, source.st_mtime_ns
+
+def _save_plane(path, array):
+    # np.save appends .npy to names, so write through a file object and rename into place
+    with open(path + ".tmp", "wb") as plane_file:
+        np.save(plane_file, np.ascontiguousarray(array))
+    os.replace(path + ".tmp", path)
+
+class AssetStore:
+    """
+    Raw-array store for decoded assets, keyed by absolute source path.
+
+    Garments keep the DecodedGarment planes (RGBA, BGR, alpha and optionally
+    the light map planes); designs keep their TrimmedGraphic (the RGBA inside
+    the alpha bounding box, the box and the full size). garment() / graphic()
+    return read-only memory-mapped views, or None if the entry is missing or
+    older than its PNG. Plane files' mtimes record last use; the least
+    recently used entries are evicted once the planes exceed max_bytes.
+    """
+    def __init__(self, store_dir, max_bytes=4 * 1024 ** 3):
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        self.built = 0
+        self.current = 0
+        self.evictions = 0
+        os.makedirs(store_dir, exist_ok=True)
+        self._index = {}
+        try:
+            with open(os.path.join(store_dir, INDEX_NAME), "r", encoding="utf-8") as index_file:
+                index = json.load(index_file)
+            if index.get("version") == STORE_VERSION:
+                self._index = index["assets"]
+        except (FileNotFoundError, ValueError):
+            pass
+        self.nbytes = sum(size for _, _, size in self._usage())
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def _entry(self, path, planes=()):
+        """
+        Index entry for path if it was built from the current file and has the given planes.
+        """
+        entry = self._index.get(os.path.abspath(path))
+        if entry is None:
+            return None
+        try:
+            size, mtime_ns = _source_stat(path)
+        except FileNotFoundError:
+            return None
+        if entry["size"] != size or entry["mtime_ns"] != mtime_ns:
+            return None
+        if any(plane not in entry["planes"] for plane in planes):
+            return None
+        return entry
+
+    def _plane_paths(self, entry):
+        return [os.path.join(self.store_dir, file_name) for file_name in entry["planes"].values()]
+
+    def _usage(self):
+        """
+        (source, last use, plane bytes) for every entry.
+        """
+        for source, entry in self._index.items():
+            last_used, nbytes = 0, 0
+            for plane_path in self._plane_paths(entry):
+                try:
+                    info = os.stat(plane_path)
+                except FileNotFoundError:
+                    continue
+                last_used, nbytes = max(last_used, info.st_mtime), nbytes + info.st_size
+            yield source, last_used, nbytes
+
+    def _touch(self, entry):
+        # Mark as recently used (a read-only store is still usable, just not evicted in LRU order)
+        for plane_path in self._plane_paths(entry):
+            try:
+                os.utime(plane_path)
+            except OSError:
+                pass
+
+    def _remove(self, source, keep=()):
+        """
+        Delete the plane files of source's entry (except the names in keep)
+        and return the bytes freed; the entry stays in the index.
+        """
+        freed = 0
+        for file_name in self._index[source]["planes"].values():
+            if file_name in keep:
+                continue
+            plane_path = os.path.join(self.store_dir, file_name)
+            try:
+                freed += os.stat(plane_path).st_size
+                os.remove(plane_path)
+            except FileNotFoundError:
+                pass
+        self.nbytes -= freed
+        return freed
+
+    def _write(self, path, kind, arrays, **fields):
+        source = os.path.abspath(path)
+        size, mtime_ns = _source_stat(path)
+        stem = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+        planes = {plane_name: f"{stem}.{plane_name}.npy" for plane_name in arrays}
+        if source in self._index:
+            # Rebuilt: planes the new entry does not have would be left behind
+            self._remove(source, keep=set(planes.values()))
+        for plane_name, array in arrays.items():
+            plane_path = os.path.join(self.store_dir, planes[plane_name])
+            if os.path.exists(plane_path):
+                self.nbytes -= os.stat(plane_path).st_size
+            _save_plane(plane_path, array)
+            self.nbytes += os.stat(plane_path).st_size
+        self._index[source] = dict(fields, kind=kind, size=size, mtime_ns=mtime_ns, planes=planes)
+        self.built += 1
+
+    def _map(self, entry):
+        return {plane_name: np.load(os.path.join(self.store_dir, file_name), mmap_mode="r")
+                for plane_name, file_name in entry["planes"].items()}
+
+    def add_garment(self, path, light_planes=False):
+        entry = self._entry(path, ("gray", "light") if light_planes else ())
+        if entry is not None:
+            self._touch(entry)
+            self.current += 1
+            return
+        garment = DecodedGarment.from_file(path)
+        if light_planes:
+            garment.ensure_light_planes()
+        self._write(path, "garment", garment.planes())
+
+    def add_graphic(self, path):
+        entry = self._entry(path)
+        if entry is not None:
+            self._touch(entry)
+            self.current += 1
+            return
+        trimmed = TrimmedGraphic.from_file(path)
+        self._write(path, "graphic", {"rgba": trimmed.rgba}, bbox=list(trimmed.bbox), full_size=list(trimmed.size))
+
+    def build(self, garments=(), graphics=(), light_planes=False):
+        """
+        Convert every given garment / design PNG that is new or changed since
+        the last build, evict least recently used entries if the store is over
+        max_bytes, then save the index. Returns {"built", "current", "evicted"} counts.
+        """
+        built, current, evictions = self.built, self.current, self.evictions
+        for path in garments:
+            self.add_garment(path, light_planes=light_planes)
+        for path in graphics:
+            self.add_graphic(path)
+        if self.nbytes > self.max_bytes:
+            self.evict()
+        if self.built > built or self.evictions > evictions:
+            self.save()
+        return {"built": self.built - built, "current": self.current - current, "evicted": self.evictions - evictions}
+
+    def evict(self, target_fraction=0.9):
+        """
+        Remove least recently used entries until the planes are under
+        target_fraction of max_bytes (so eviction does not run on every build).
+        The caller saves the index.
+        """
+        usage = sorted(self._usage(), key=lambda entry: entry[1])
+        self.nbytes = sum(size for _, _, size in usage)
+        for source, _, _ in usage:
+            if self.nbytes <= self.max_bytes * target_fraction:
+                break
+            self._remove(source)
+            del self._index[source]
+            self.evictions += 1
+
+    def prune(self):
+        """
+        Drop entries whose PNG no longer exists and delete their planes.
+        """
+        removed = 0
+        for source in [source for source in self._index if not os.path.exists(source)]:
+            self._remove(source)
+            del self._index[source]
+            removed += 1
+        if removed:
+            self.save()
+        return removed
+
+    def save(self):
+        index_path = os.path.join(self.store_dir, INDEX_NAME)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as index_file:
+            json.dump({"version": STORE_VERSION, "assets": self._index}, index_file)
+        os.replace(index_path + ".tmp", index_path)
+
+    def garment(self, path):
+        entry = self._entry(path)
+        if entry is None or entry["kind"] != "garment":
+            return None
+        self._touch(entry)
+        return DecodedGarment(**self._map(entry))
+
+    def graphic(self, path):
+        entry = self._entry(path)
+        if entry is None or entry["kind"] != "graphic":
+            return None
+        self._touch(entry)
+        return TrimmedGraphic(self._map(entry)["rgba"], tuple(entry["bbox"]), tuple(entry["full_size"]))
+
+def _pngs(folder):
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.lower().endswith(".png"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert garment and design PNGs into a memory-mapped .npy store.")
+    parser.add_argument("--store", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "AssetStore"),
+                        help="Store folder")
+    parser.add_argument("--graphics", default=None, help="Folder of design PNGs")
+    parser.add_argument("--garments", default=None, help="Folder of garment PNGs")
+    parser.add_argument("--light-planes", action="store_true", help="Also store the garments' light map planes")
+    parser.add_argument("--prune", action="store_true", help="Remove entries whose PNG was deleted")
+    parser.add_argument("--max-mb", type=float, default=4096, help="Store size limit in MB (least recently used entries are removed)")
+    args = parser.parse_args(argv)
+
+    store = AssetStore(args.store, int(args.max_mb * 1024 * 1024))
+    counts = store.build(
+        garments=_pngs(args.garments) if args.garments else (),
+        graphics=_pngs(args.graphics) if args.graphics else (),
+        light_planes=args.light_planes,
+    )
+    removed = store.prune() if args.prune else 0
+    print(f"{counts['built']} converted, {counts['current']} up to date, {counts['evicted']} evicted, {removed} removed, "
+          f"{len(store)} assets in {args.store}")
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,33 @@ import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import io
+import json
 import os
 import zipfile
 from streamlit_drawable_canvas import st_canvas
 
+from compositing import BACKENDS, active_backend, premultiply_alpha, select_backend
+from memory_budget import garment_footprint, job_footprint, peak_rss_bytes, reset_peak_rss, rss_mb
+from render_cache import RenderCache, bytes_digest
+from render_profile import RenderProfile, RowTimer, stage_rows
+
 #TO RUN: streamlit run batch_combiner.py
 
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+RENDER_CACHE_FOLDER = os.path.join(CURRENT_DIR, "RenderCache")
+
+# Bump when a change alters rendered pixels (invalidates cached renders)
+RENDERER_VERSION = 2
+
+# Results are shown as previews at most this wide, and only this many of them
+PREVIEW_WIDTH = 400
+MAX_PREVIEWS = 60
+
+# One render cache per server process (Streamlit re-runs this script on every interaction)
+@st.cache_resource
+def get_render_cache():
+    return RenderCache(RENDER_CACHE_FOLDER)
+
 def generate_displacement_map(apparel_img):
     gray = cv2.cvtColor(apparel_img, cv2.COLOR_BGR2GRAY)
     displacement = cv2.GaussianBlur(gray, (21, 21), 0)
@@ -53,23 +74,37 @@ def apply_fabric_wrap_blend(logo_img, apparel_img, alpha, position, intensity=0.
     blended_rgb = np.clip(blended_rgb * 255, 0, 255).astype(np.uint8)
     return blended_rgb
 
-#main function to combine the image and logo
-def overlay_logo(apparel_img, logo_img, position, scale=0.3, apply_light_map=False, wrap_intensity=15):
+#main function to combine the image and logo (stage times go into timer, a RowTimer, if one is passed)
+def overlay_logo(apparel_img, logo_img, position, scale=0.3, apply_light_map=False, wrap_intensity=15, timer=None):
+    timer = timer if timer is not None else RowTimer()
+
     # Get images as arrays
-    apparel = np.array(apparel_img.convert("RGB"))[:, :, ::-1]  # Convert to BGR
-    logo = np.array(logo_img.convert("RGBA"))  # Keep alpha (transparency)
+    with timer.stage("decode"):
+        apparel = np.array(apparel_img.convert("RGB"))[:, :, ::-1]  # Convert to BGR
+        logo = np.array(logo_img.convert("RGBA"))  # Keep alpha (transparency)
+    timer.count("decode", apparel.nbytes + logo.nbytes)
 
     # Resize logo
-    logo_h = int(apparel.shape[0] * scale)
-    logo_w = int(logo.shape[1] * logo_h / logo.shape[0])
-    logo = cv2.resize(logo, (logo_w, logo_h), interpolation=cv2.INTER_AREA)
+    with timer.stage("resize"):
+        logo_h = int(apparel.shape[0] * scale)
+        logo_w = int(logo.shape[1] * logo_h / logo.shape[0])
+        logo = cv2.resize(logo, (logo_w, logo_h), interpolation=cv2.INTER_AREA)
+    timer.count("resize", logo.nbytes)
+    with timer.stage("blend"):
+        output = _blend_logo(apparel_img, apparel, logo, position, apply_light_map, wrap_intensity)
+    timer.count("blend", logo.nbytes)
+    return output
+
+# Premultiply, light map and composite of an already resized logo (the blend stage of overlay_logo)
+def _blend_logo(apparel_img, apparel, logo, position, apply_light_map, wrap_intensity):
+    logo_h, logo_w = logo.shape[:2]
 
     # Separate the alpha channel from the logo
-    alpha = logo[:, :, 3] / 255.0  # Normalize alpha to [0, 1]
+    alpha = np.ascontiguousarray(logo[:, :, 3])
     logo_rgb = logo[:, :, :3][:, :, ::-1]  # Convert logo to BGR
 
     # Pre-multiply the RGB values by the alpha channel
-    logo_rgb = (logo_rgb * alpha[:, :, None]).astype(np.uint8)
+    logo_rgb = premultiply_alpha(logo_rgb, alpha)
 
     # Get center position coordinates
     center_x, center_y = position
@@ -88,14 +123,8 @@ def overlay_logo(apparel_img, logo_img, position, scale=0.3, apply_light_map=Fal
         # Pass both apparel and logo to the blending as BGR images with center position
         logo_rgb = apply_fabric_wrap_blend(logo_rgb, apparel_bgr, alpha, (center_x, center_y), intensity=wrap_intensity / 100.0)
 
-    # Position logo and blend it into apparel
-    roi = apparel[y:y + logo.shape[0], x:x + logo.shape[1]]
-
-    # Blend the logo into the apparel image
-    for c in range(3):
-        roi[:, :, c] = (logo_rgb[:, :, c] + roi[:, :, c] * (1 - alpha)).astype(np.uint8)
-
-    apparel[y:y + logo.shape[0], x:x + logo.shape[1]] = roi
+    # Blend the logo into the apparel image in place with the selected compositing backend
+    active_backend().composite(apparel[y:y + logo.shape[0], x:x + logo.shape[1]], logo_rgb, alpha)
 
     return cv2.cvtColor(apparel, cv2.COLOR_BGR2RGB)
 
@@ -197,6 +226,14 @@ position_option = st.selectbox("Logo Position", [
     "Center", "Upper Left", "Upper Right", "Bottom Left", "Bottom Right", "Custom"
 ])
 
+# Compositing backend ("auto" times each one once per server process and keeps the fastest)
+compositor = st.selectbox("Compositing Backend", ["auto"] + list(BACKENDS))
+select_backend(compositor)
+
+# Memory budget: bounds the previews kept and flags images too big to render within it
+budget_mb = st.number_input("Memory budget (MB, 0 = no limit)", 0, 1000000, 0)
+budget_bytes = int(budget_mb) * 1024 * 1024
+
 # Custom position options
 custom_position = None
 if position_option == "Custom" and apparel_files:
@@ -222,62 +259,126 @@ if apparel_files and logo_file and len(apparel_files) > 0:
     if st.button("Process All Images"):
         # Create a progress bar
         progress_bar = st.progress(0)
-        processed_images = []
-        file_names = []
-        
-        # Process each apparel image
-        for i, apparel_file in enumerate(apparel_files):
-            apparel_img = Image.open(apparel_file)
-            file_names.append(apparel_file.name)
-            
-            # Calculate logo dimensions for positioning
-            logo_h = int(apparel_img.height * scale)
-            logo_w = int(logo_img.width * logo_h / logo_img.height)
-            
-            # Determine position
-            if position_option == "Custom" and custom_position:
-                position = custom_position
-            else:
-                position = get_position_coords(position_option, (apparel_img.width, apparel_img.height), (logo_w, logo_h))
-            
-            # Apply overlay
-            output = overlay_logo(
-                apparel_img, logo_img, position,
-                scale=scale, apply_light_map=apply_light_map, wrap_intensity=wrap_intensity
-            )
-            
-            processed_images.append(output)
-            progress_bar.progress((i + 1) / len(apparel_files))
-        
+        previews = []
+        render_cache = get_render_cache()
+        logo_digest = bytes_digest(logo_file.getvalue())
+        profile = RenderProfile()
+        reset_peak_rss()
+        over_budget = []
+        preview_bytes = 0
+        hidden_previews = 0
+
+        # Each PNG goes into the ZIP as soon as it is encoded; only small previews are kept
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, "w") as zip_file:
+            # Process each apparel image
+            for i, apparel_file in enumerate(apparel_files):
+                apparel_img = Image.open(apparel_file)
+
+                # Calculate logo dimensions for positioning
+                logo_h = int(apparel_img.height * scale)
+                logo_w = int(logo_img.width * logo_h / logo_img.height)
+
+                # Estimated memory for this image from its header (nothing decoded yet)
+                footprint = (garment_footprint(apparel_img.width, apparel_img.height)
+                             + job_footprint(apparel_img.size, (logo_w, logo_h), apply_light_map))
+                if budget_bytes and footprint > budget_bytes:
+                    over_budget.append(apparel_file.name)
+
+                # Determine position
+                if position_option == "Custom" and custom_position:
+                    position = custom_position
+                else:
+                    position = get_position_coords(position_option, (apparel_img.width, apparel_img.height), (logo_w, logo_h))
+
+                # Reuse the encoded PNG if this exact render was done before
+                cache_key = RenderCache.key(
+                    apparel=bytes_digest(apparel_file.getvalue()),
+                    logo=logo_digest,
+                    logo_size=(logo_w, logo_h),
+                    position=tuple(position),
+                    apply_light_map=bool(apply_light_map),
+                    wrap_intensity=wrap_intensity if apply_light_map else 0,
+                    format="png",
+                    renderer=RENDERER_VERSION,
+                    compositor=active_backend().pixels,
+                )
+                timer = RowTimer()
+                source = "render_cache"
+                output = None
+                png_bytes = render_cache.get(cache_key, fmt="png")
+                if png_bytes is None:
+                    # Apply overlay
+                    source = "render"
+                    output = overlay_logo(
+                        apparel_img, logo_img, position,
+                        scale=scale, apply_light_map=apply_light_map, wrap_intensity=wrap_intensity, timer=timer
+                    )
+                    with timer.stage("encode"):
+                        img_buffer = io.BytesIO()
+                        Image.fromarray(output).save(img_buffer, format="PNG")
+                        png_bytes = img_buffer.getvalue()
+                    timer.count("encode", len(png_bytes))
+                    render_cache.put(cache_key, png_bytes, fmt="png")
+
+                # Create filename: original_name + _logo.png; PNGs are already compressed, so store them as-is
+                new_filename = f"{os.path.splitext(apparel_file.name)[0]}_logo.png"
+                with timer.stage("zip"):
+                    zip_file.writestr(new_filename, png_bytes, compress_type=zipfile.ZIP_STORED)
+                timer.count("zip", len(png_bytes))
+                profile.add(apparel_file.name, new_filename, timer, source)
+
+                # Downscaled preview while they fit in an eighth of the budget (or up to MAX_PREVIEWS)
+                if len(previews) < MAX_PREVIEWS and (not budget_bytes or preview_bytes < budget_bytes // 8):
+                    preview = Image.fromarray(output) if output is not None else Image.open(io.BytesIO(png_bytes))
+                    preview.thumbnail((PREVIEW_WIDTH, PREVIEW_WIDTH * 2))
+                    preview = np.asarray(preview)
+                    preview_bytes += preview.nbytes
+                    previews.append((preview, apparel_file.name))
+                else:
+                    hidden_previews += 1
+                output = png_bytes = None  # Drop the full-resolution result before the next image
+                progress_bar.progress((i + 1) / len(apparel_files))
+
         # Display results
+        cache_stats = render_cache.stats()
+        st.caption(f"Render cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses this session")
+        peak_rss = rss_mb(peak_rss_bytes())
+        if peak_rss is not None:
+            st.caption(f"Peak memory: {peak_rss} MB" + (f" (budget {budget_mb} MB)" if budget_bytes else ""))
+        if over_budget:
+            st.warning(f"{len(over_budget)} image(s) alone need more than the memory budget: {', '.join(over_budget[:10])}")
         st.markdown("### Processed Images")
-        
+
         # Display images in a grid (3 columns)
         cols = st.columns(3)
-        for i, output in enumerate(processed_images):
+        for i, (preview, file_name) in enumerate(previews):
             with cols[i % 3]:
-                st.image(output, caption=file_names[i], use_container_width=True)
-        
-        # Create ZIP file for download
-        if processed_images:
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w") as zip_file:
-                for i, output in enumerate(processed_images):
-                    img_pil = Image.fromarray(output)
-                    img_buffer = io.BytesIO()
-                    img_pil.save(img_buffer, format="PNG")
-                    img_buffer.seek(0)
-                    
-                    # Create filename: original_name + _logo.png
-                    base_name = os.path.splitext(file_names[i])[0]
-                    new_filename = f"{base_name}_logo.png"
-                    
-                    zip_file.writestr(new_filename, img_buffer.getvalue())
-            
+                st.image(preview, caption=file_name, use_container_width=True)
+        if hidden_previews:
+            st.caption(f"{hidden_previews} more images are in the ZIP but not previewed")
+
+        # Download the ZIP
+        if previews or hidden_previews:
             zip_buffer.seek(0)
             st.download_button(
                 label="Download All Processed Images (ZIP)",
                 data=zip_buffer,
                 file_name="processed_apparel_logos.zip",
                 mime="application/zip"
+            )
+
+            # Stage timings for the batch, shown and offered as JSON alongside the ZIP
+            report = profile.report()
+            st.markdown("### Render Profile")
+            st.caption(f"{report['rows']} images in {report['wall_seconds']:.1f}s")
+            st.dataframe(stage_rows(report))
+            with st.expander("Slowest images"):
+                st.dataframe([{"image": entry["row"], "source": entry["source"], "total ms": entry["total_ms"],
+                               **entry["stages_ms"]} for entry in report["slowest_rows"]])
+            st.download_button(
+                label="Download Render Profile (JSON)",
+                data=json.dumps(report, indent=2),
+                file_name="processed_apparel_logos.profile.json",
+                mime="application/json"
             )
\ No newline at end of file
@@ -0,0 +1,2 @@
+#Micro-benchmarks for the rendering code. Run from the repo root, e.g.:
+#    python -m benchmarks.bench_light_map
@@ -0,0 +1,27 @@
+import argparse
+import numpy as np
+
+from compositing import BACKENDS, calibration_sample, calibrate, select_backend
+
+#Per-backend compositing time on the startup calibration logos, and the backend "auto" picks
+#TO RUN: python -m benchmarks.bench_backends --sizes 185,370,740,1480
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the compositing backends.")
+    parser.add_argument("--sizes", default="185,370,740,1480", help="Comma separated logo widths")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    names = list(BACKENDS)
+    print(f"{'logo':>6} " + " ".join(f"{name:>10}" for name in names) + "  pixels match numpy")
+    for width in (int(v) for v in args.sizes.split(",")):
+        timings = calibrate(widths=(width,), repeat=args.repeat)
+        garment, logo, alpha, regions = calibration_sample(width)
+        reference = BACKENDS["numpy"]().composite(garment.copy(), logo, alpha, regions)
+        same = [name for name in names
+                if np.array_equal(BACKENDS[name]().composite(garment.copy(), logo, alpha, regions), reference)]
+        print(f"{width:>6} " + " ".join(f"{timings[name] * 1000:>7.2f} ms" for name in names) + f"  {', '.join(same)}")
+    print(f"auto selects: {select_backend('auto').name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import time
+import tracemalloc
+import numpy as np
+
+from benchmarks.synthetic import garment_rgba, graphic_rgba
+from compositing import BACKENDS, AlphaRegions, composite_into, premultiply_alpha
+
+#Fixed-point composite_into (and the numpy backend's sparse-alpha composite) vs the old float64 per-channel blend:
+#time, temporary memory and error
+#TO RUN: python -m benchmarks.bench_composite --sizes 185,370,740,1480
+
+# The blend as overlay_logo used to do it (alpha normalized to float64 [0, 1])
+def legacy_composite(roi, logo_bgr, alpha):
+    alpha = alpha / 255.0
+    for c in range(3):
+        roi[:, :, c] = (logo_bgr[:, :, c] + roi[:, :, c] * (1 - alpha)).astype(np.uint8)
+    return roi
+
+def synthetic_inputs(width, height, seed=0):
+    # Garment BGR with a margin around the logo, and a pre-multiplied design
+    garment = np.ascontiguousarray(garment_rgba(width + 200, height + 200, seed=seed)[:, :, :3])
+    design = graphic_rgba(width, height, seed=seed + 1)
+    alpha = np.ascontiguousarray(design[:, :, 3])
+    logo = premultiply_alpha(design[:, :, :3], alpha)
+    return garment, logo, alpha
+
+def measure(func, garment, logo, alpha, repeat):
+    """
+    Best time and peak temporary bytes for blending into a fresh garment ROI.
+    """
+    height, width = alpha.shape
+    best = float("inf")
+    for _ in range(repeat):
+        target = garment.copy()
+        start = time.perf_counter()
+        func(target[100:100 + height, 100:100 + width], logo, alpha)
+        best = min(best, time.perf_counter() - start)
+    target = garment.copy()
+    tracemalloc.start()
+    func(target[100:100 + height, 100:100 + width], logo, alpha)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, target
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the alpha compositing kernel.")
+    parser.add_argument("--sizes", default="185,370,740,1480", help="Comma separated logo widths")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    backend = BACKENDS["numpy"]()
+    print(f"{'logo':>10} {'legacy':>10} {'kernel':>10} {'regions':>10} {'speedup':>8} "
+          f"{'legacy tmp':>11} {'kernel tmp':>11} {'max err':>8} {'same':>5}")
+    for width in (int(v) for v in args.sizes.split(",")):
+        garment, logo, alpha = synthetic_inputs(width, int(width * 0.85))
+        regions = AlphaRegions.from_alpha(alpha)  # Cached with the resized graphic in csv_pipeline
+        legacy, legacy_peak, legacy_out = measure(legacy_composite, garment, logo, alpha, args.repeat)
+        kernel, kernel_peak, kernel_out = measure(composite_into, garment, logo, alpha, args.repeat)
+        sparse, _, sparse_out = measure(lambda roi, logo, alpha: backend.composite(roi, logo, alpha, regions),
+                                        garment, logo, alpha, args.repeat)
+        error = np.abs(legacy_out.astype(np.int16) - kernel_out).max()
+        print(f"{width:>4}x{alpha.shape[0]:<5} {legacy * 1000:>7.2f} ms {kernel * 1000:>7.2f} ms {sparse * 1000:>7.2f} ms "
+              f"{legacy / sparse:>7.2f}x {legacy_peak / 2**20:>8.1f} MB {kernel_peak / 2**20:>8.1f} MB {error:>8} "
+              f"{str(np.array_equal(kernel_out, sparse_out)):>5}")
+
+if __name__ == "__main__":
+    main()
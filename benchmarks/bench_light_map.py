@@ -0,0 +1,48 @@
+import argparse
+import time
+from PIL import Image
+
+from asset_cache import DecodedGarment, ResizedGraphic
+from benchmarks.synthetic import garment_rgba, graphic_rgba
+from benchmarks.timing import best_of
+from csv_pipeline import composite_logo
+
+#Per-row cost of light map wrapping: per-row grayscale + blur vs cached garment planes
+#TO RUN: python -m benchmarks.bench_light_map --garment 2000x2400
+
+def synthetic_garment(width, height, seed=0):
+    return DecodedGarment.from_rgba(garment_rgba(width, height, seed=seed))
+
+def synthetic_logo(width, height, seed=1):
+    # One soft-edged ellipse filling the logo rectangle
+    return ResizedGraphic.from_image(Image.fromarray(graphic_rgba(width, height, complexity=0, margin=0, seed=seed)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark light map wrapping per row.")
+    parser.add_argument("--garment", default="1000x1200", help="Garment size WxH")
+    parser.add_argument("--logos", default="185,370,740", help="Comma separated logo widths")
+    parser.add_argument("--intensity", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.garment.split("x"))
+    garment = synthetic_garment(width, height)
+
+    start = time.perf_counter()
+    garment.ensure_light_planes()
+    setup = time.perf_counter() - start
+    print(f"garment {width}x{height}: light planes computed once in {setup * 1000:.1f} ms")
+    print(f"{'logo':>10} {'per-row blur':>14} {'cached planes':>14} {'plain':>10} {'speedup':>8}")
+
+    for logo_width in (int(v) for v in args.logos.split(",")):
+        logo = synthetic_logo(logo_width, int(logo_width * 0.85))
+        position = (width // 2, height // 3)
+        per_row = best_of(lambda: composite_logo(garment.bgr, logo, position, True, args.intensity), args.repeat)
+        cached = best_of(lambda: composite_logo(garment.bgr, logo, position, True, args.intensity,
+                                                light_planes=(garment.gray, garment.light)), args.repeat)
+        plain = best_of(lambda: composite_logo(garment.bgr, logo, position, False), args.repeat)
+        print(f"{logo.width:>4}x{logo.height:<5} {per_row * 1000:>11.2f} ms {cached * 1000:>11.2f} ms "
+              f"{plain * 1000:>7.2f} ms {per_row / cached:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+from PIL import Image
+
+from benchmarks.bench_light_map import synthetic_garment, synthetic_logo
+from csv_pipeline import composite_logo, render_flat
+
+#One render_job row, old compose -> putalpha -> alpha_composite -> convert chain vs
+#the fused render_flat path: ms per row, peak RSS growth and whether the pixels match.
+#Each mode runs in its own process; on Linux the peak RSS mark is reset after setup.
+#TO RUN: python -m benchmarks.bench_render_row --light-map
+
+# render_job's body before render_flat
+def legacy_row(garment, graphic, position, apply_light_map, wrap_intensity):
+    light_planes = None
+    if apply_light_map:
+        garment.ensure_light_planes()
+        light_planes = (garment.gray, garment.light)
+    result_img = composite_logo(garment.bgr, graphic, position, apply_light_map, wrap_intensity, light_planes=light_planes)
+    result_img_pil = Image.fromarray(result_img).convert("RGBA")
+    result_img_pil.putalpha(garment.alpha_image())
+    white_bg = Image.new("RGB", result_img_pil.size, (255, 255, 255))
+    return Image.alpha_composite(white_bg.convert("RGBA"), result_img_pil).convert("RGB")
+
+def fused_row(garment, graphic, position, apply_light_map, wrap_intensity):
+    return Image.fromarray(render_flat(garment, graphic, position, apply_light_map, wrap_intensity))
+
+MODES = {"legacy": legacy_row, "fused": fused_row}
+
+# Peak RSS in KB. Linux resets the mark through /proc/self/clear_refs; elsewhere it
+# is ru_maxrss, which includes the setup.
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+def peak_rss_kb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def inputs(size, logo_width):
+    width, height = (int(v) for v in size.split("x"))
+    garment = synthetic_garment(width, height)
+    garment.ensure_light_planes()
+    garment.alpha_regions  # Built once per garment, like the light planes
+    graphic = synthetic_logo(logo_width, int(logo_width * 0.85))
+    return garment, graphic, (width // 2, height // 3)
+
+def run_mode(mode, size, logo_width, apply_light_map, rows):
+    """
+    Render `rows` rows (JPEG included) in this process and return timing and peak RSS growth.
+    """
+    garment, graphic, position = inputs(size, logo_width)
+    reset_peak_rss()
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    for _ in range(rows):
+        image = MODES[mode](garment, graphic, position, apply_light_map, 10)
+        image.save(io.BytesIO(), "JPEG", quality=95)
+    seconds = time.perf_counter() - start
+    peak = peak_rss_kb()
+    return {"ms_per_row": seconds / rows * 1000, "peak_rss_growth_mb": (peak - baseline) / 1024}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the fused compose-mask-flatten path.")
+    parser.add_argument("--garment", default="2000x2400", help="Garment size WxH")
+    parser.add_argument("--logo", type=int, default=740, help="Logo width")
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--light-map", action="store_true")
+    parser.add_argument("--mode", choices=sorted(MODES), help=argparse.SUPPRESS)  # Child process
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.garment, args.logo, args.light_map, args.rows)))
+        return
+
+    garment, graphic, position = inputs(args.garment, args.logo)
+    same = np.array_equal(np.asarray(legacy_row(garment, graphic, position, args.light_map, 10)),
+                          np.asarray(fused_row(garment, graphic, position, args.light_map, 10)))
+    print(f"garment {args.garment}, logo {args.logo} px, light map {args.light_map}: pixels match {same}")
+    for mode in ("legacy", "fused"):
+        command = [sys.executable, "-m", "benchmarks.bench_render_row", "--mode", mode, "--garment", args.garment,
+                   "--logo", str(args.logo), "--rows", str(args.rows)] + (["--light-map"] if args.light_map else [])
+        result = json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout)
+        print(f"{mode:>8}: {result['ms_per_row']:7.2f} ms/row, peak RSS +{result['peak_rss_growth_mb']:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from PIL import Image
+
+from asset_cache import ResizedGraphic
+from benchmarks.synthetic import garment_rgba, graphic_rgba, parse_size, write_benchmark_set
+from benchmarks.timing import best_of
+from combiner_opencv import apply_displacement_map, generate_displacement_map
+from compositing import apply_perspective_warp
+from csv_pipeline import apply_fabric_wrap_blend, overlay_logo
+
+#Timings of the main render paths on synthetic assets, compared against a saved baseline
+#TO RUN: python -m benchmarks.bench_suite --save-baseline   (then re-run after a change)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# End-to-end run in a fresh process, so its peak RSS is the run's own
+END_TO_END = """
+import json, resource, sys
+from csv_pipeline import run_job_sheet
+sheet, folder, light, workers = sys.argv[1], sys.argv[2], sys.argv[3] == "1", int(sys.argv[4])
+stats = run_job_sheet(sheet, graphics_folder=folder + "/Graphics", garments_folder=folder + "/Garments",
+                      output_dir=folder + "/Output", apply_light_map=light, wrap_intensity=10 if light else 0,
+                      workers=workers)
+print(json.dumps({"rows": stats["rows"], "seconds": stats["seconds"], "rows_per_second": stats["rows_per_second"],
+                  "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}))
+"""
+
+def kernel_timings(args):
+    """
+    Best-of-repeat seconds for each render kernel on one synthetic garment and design.
+    """
+    garment_w, garment_h = parse_size(args.garment_size)
+    apparel_img = Image.fromarray(garment_rgba(garment_w, garment_h))
+    apparel_bgr = np.ascontiguousarray(np.array(apparel_img.convert("RGB"))[:, :, ::-1])
+
+    design = Image.fromarray(graphic_rgba(*parse_size(args.graphic_size), complexity=args.complexity))
+    logo_img = design.resize((args.logo_width, int(args.logo_width * design.height / design.width)), Image.Resampling.LANCZOS)
+    logo_rgba = np.array(logo_img)
+    graphic = ResizedGraphic.from_image(logo_img)
+    position = (garment_w // 2, garment_h // 2 - 40)
+
+    displacement = generate_displacement_map(apparel_bgr)
+    h, w = logo_rgba.shape[:2]
+    corners = [(0, 0), (w, 0), (w, h), (0, h)]
+    three_quarter = [(0, h * 0.05), (w * 0.85, 0), (w * 0.85, h), (0, h * 0.95)]  # 3/4 turn left
+
+    timings = {
+        "overlay_logo": lambda: overlay_logo(apparel_img, logo_img, position),
+        "overlay_logo_light_map": lambda: overlay_logo(apparel_img, logo_img, position, apply_light_map=True, wrap_intensity=10),
+        "apply_fabric_wrap_blend": lambda: apply_fabric_wrap_blend(graphic.premult_bgr, apparel_bgr, graphic.alpha, position, 0.1),
+        "apply_displacement_map": lambda: apply_displacement_map(logo_rgba, displacement, 10),
+        "apply_perspective_warp": lambda: apply_perspective_warp(logo_rgba, corners, three_quarter),
+    }
+    return {name: round(best_of(func, args.repeat), 6) for name, func in timings.items()}
+
+def end_to_end(args, folder, light):
+    """
+    rows/s and peak RSS of run_job_sheet on a synthetic sheet, in a child process.
+    """
+    sheet_path = os.path.join(folder, "sheet.csv")
+    result = subprocess.run(
+        [sys.executable, "-c", END_TO_END, sheet_path, folder, "1" if light else "0", str(args.workers)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def compare(results, baseline, tolerance):
+    """
+    Print every metric against the baseline; return the names that regressed by more than tolerance.
+    """
+    regressions = []
+    print(f"{'metric':>36} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, value in results["metrics"].items():
+        before = baseline["metrics"].get(name)
+        if before is None:
+            print(f"{name:>36} {'-':>12} {value:>12.4f}")
+            continue
+        # Lower is better except for throughput
+        higher_is_better = name.endswith("rows_per_second")
+        change = (value - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:>36} {before:>12.4f} {value:>12.4f} {change:>+7.1%}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the render paths on synthetic assets.")
+    parser.add_argument("--garment-size", default="2000x2400", help="Synthetic garment WxH")
+    parser.add_argument("--graphic-size", default="1500x1300", help="Synthetic design WxH (before resizing)")
+    parser.add_argument("--complexity", type=float, default=0.5, help="Alpha detail of the designs (0-1)")
+    parser.add_argument("--logo-width", type=int, default=370, help="Print width for the kernel timings")
+    parser.add_argument("--rows", type=int, default=100, help="Job sheet length for the end-to-end runs")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against / save")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    config = {key: getattr(args, key) for key in ("garment_size", "graphic_size", "complexity", "logo_width", "rows", "workers")}
+    metrics = {f"{name}_seconds": seconds for name, seconds in kernel_timings(args).items()}
+    with tempfile.TemporaryDirectory() as folder:
+        write_benchmark_set(folder, rows=args.rows, garment_size=parse_size(args.garment_size),
+                            graphic_size=parse_size(args.graphic_size), complexity=args.complexity)
+        for light in (False, True):
+            run = end_to_end(args, folder, light)
+            label = "process_csv_light_map" if light else "process_csv"
+            metrics[f"{label}_rows_per_second"] = run["rows_per_second"]
+            metrics[f"{label}_peak_rss_mb"] = run["peak_rss_mb"]
+
+    results = {
+        "config": config,
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "metrics": metrics,
+    }
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["config"] != config:
+            print(f"warning: baseline was recorded with {baseline['config']}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        return
+
+    for name, value in metrics.items():
+        print(f"{name:>36} {value:>12.4f}")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Wrote {args.baseline}")
+
+if __name__ == "__main__":
+    main()
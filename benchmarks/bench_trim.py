@@ -0,0 +1,66 @@
+import argparse
+import numpy as np
+from PIL import Image
+
+from asset_cache import ResizedGraphic, TrimmedGraphic
+from benchmarks.synthetic import graphic_rgba
+from benchmarks.timing import best_of
+from compositing import active_backend
+
+#Resize + blend cost of a design with transparent margins: full design vs the trimmed one
+#TO RUN: python -m benchmarks.bench_trim --design Graphics/<name>.png --widths 185,308,370,555,740
+
+def synthetic_design(width=1500, height=1300, margin=0.15, seed=2):
+    """
+    Soft-edged artwork with a transparent margin on every side, like most Graphics/ PNGs.
+    """
+    return Image.fromarray(graphic_rgba(width, height, complexity=0, margin=margin, seed=seed))
+
+def full_resize(design_img, width):
+    height = int(width * (design_img.height / design_img.width))
+    return ResizedGraphic.from_image(design_img.resize((width, height), Image.Resampling.LANCZOS))
+
+def blend(graphic, garment):
+    x, y = graphic.offset
+    roi = garment[100 + y:100 + y + graphic.alpha.shape[0], 100 + x:100 + x + graphic.alpha.shape[1]]
+    active_backend().composite(roi, graphic.premult_bgr, graphic.alpha, graphic.regions)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingest-time trimming of transparent design margins.")
+    parser.add_argument("--design", default=None, help="Design PNG (default: synthetic 1500x1300 with 15%% margins)")
+    parser.add_argument("--widths", default="185,308,370,555,740", help="Comma separated print widths in pixels")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    design_img = Image.open(args.design).convert("RGBA") if args.design else synthetic_design()
+    trimmed = TrimmedGraphic.from_image(design_img)
+    trim_time = best_of(lambda: TrimmedGraphic.from_image(design_img), args.repeat)
+    left, top, right, bottom = trimmed.bbox
+    print(f"design {design_img.width}x{design_img.height}, content {right - left}x{bottom - top} "
+          f"({(right - left) * (bottom - top) / (design_img.width * design_img.height):.0%}), "
+          f"trimmed once in {trim_time * 1000:.1f} ms")
+
+    print(f"{'width':>6} {'full resize':>12} {'trim resize':>12} {'full blend':>11} {'trim blend':>11} "
+          f"{'blend area':>11} {'same':>5}")
+    rng = np.random.default_rng(0)
+    widths = [int(v) for v in args.widths.split(",")]
+    # The design's own width too: a 1:1 resize must be an exact copy
+    widths += [] if design_img.width in widths else [design_img.width]
+    for width in widths:
+        full = full_resize(design_img, width)
+        cut = trimmed.resize(width)
+        garment = rng.integers(0, 256, (full.height + 200, full.width + 200, 3), dtype=np.uint8)
+        full_out, cut_out = garment.copy(), garment.copy()
+        blend(full, full_out)
+        blend(cut, cut_out)
+
+        resize_full = best_of(lambda: full_resize(design_img, width), args.repeat)
+        resize_cut = best_of(lambda: trimmed.resize(width), args.repeat)
+        blend_full = best_of(lambda: blend(full, garment.copy()), args.repeat)
+        blend_cut = best_of(lambda: blend(cut, garment.copy()), args.repeat)
+        area = cut.alpha.size / full.alpha.size
+        print(f"{width:>6} {resize_full * 1000:>9.2f} ms {resize_cut * 1000:>9.2f} ms {blend_full * 1000:>8.2f} ms "
+              f"{blend_cut * 1000:>8.2f} ms {area:>10.0%} {str(np.array_equal(full_out, cut_out)):>5}")
+
+if __name__ == "__main__":
+    main()
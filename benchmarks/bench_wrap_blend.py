@@ -0,0 +1,57 @@
+import argparse
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import garment_rgba, graphic_rgba
+from benchmarks.timing import best_of
+from compositing import blend_light_map
+
+#Light map blend kernel vs the old per-channel np.where loop, across logo sizes
+#TO RUN: python -m benchmarks.bench_wrap_blend --sizes 185,370,740,1480
+
+# The blend as csv_combiner.py / csv_combinerv2.py used to do it
+def legacy_blend(logo_img, light_map, intensity):
+    rgb = logo_img.astype(np.float32) / 255.0
+    blended_rgb = np.zeros_like(rgb)
+    for c in range(3):
+        blended_rgb[:, :, c] = np.where(
+            light_map > 0.5,
+            rgb[:, :, c] * (1.0 - intensity) + rgb[:, :, c] * light_map * intensity,
+            rgb[:, :, c]
+        )
+    return np.clip(blended_rgb * 255, 0, 255).astype(np.uint8)
+
+def synthetic_inputs(width, height, seed=0):
+    """
+    Design pixels plus a float64 (per-row) and float32 (garment planes) light
+    map from the grayscale of the same fabric.
+    """
+    logo = np.ascontiguousarray(graphic_rgba(width, height, seed=seed + 1)[:, :, :3])
+    fabric = cv2.cvtColor(np.ascontiguousarray(garment_rgba(width, height, seed=seed)[:, :, :3]), cv2.COLOR_RGB2GRAY)
+    min_val, max_val = fabric.min(), fabric.max()
+    light64 = cv2.GaussianBlur((fabric - min_val) / (max_val - min_val), (21, 21), 0)
+    light32 = (cv2.GaussianBlur(fabric.astype(np.float32), (21, 21), 0) - np.float32(min_val)) / np.float32(max_val - min_val)
+    return logo, light64, light32
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the light map blend kernel.")
+    parser.add_argument("--sizes", default="185,370,740,1480", help="Comma separated logo widths")
+    parser.add_argument("--intensity", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    print(f"{'logo':>10} {'map':>8} {'legacy':>10} {'kernel':>10} {'speedup':>8} {'identical':>10}")
+    for width in (int(v) for v in args.sizes.split(",")):
+        logo, light64, light32 = synthetic_inputs(width, int(width * 0.85))
+        for label, light_map in (("float64", light64), ("float32", light32)):
+            # A NumPy scalar intensity must give the same output as the Python float
+            expected = legacy_blend(logo, light_map, args.intensity)
+            identical = all(np.array_equal(expected, blend_light_map(logo, light_map, intensity))
+                            for intensity in (args.intensity, np.float64(args.intensity)))
+            legacy = best_of(lambda: legacy_blend(logo, light_map, args.intensity), args.repeat)
+            kernel = best_of(lambda: blend_light_map(logo, light_map, args.intensity), args.repeat)
+            print(f"{logo.shape[1]:>4}x{logo.shape[0]:<5} {label:>8} {legacy * 1000:>7.2f} ms {kernel * 1000:>7.2f} ms "
+                  f"{legacy / kernel:>7.2f}x {str(identical):>10}")
+
+if __name__ == "__main__":
+    main()
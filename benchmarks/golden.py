@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import sys
+import cv2
+import numpy as np
+from PIL import Image
+
+from asset_cache import DecodedGarment, TrimmedGraphic
+from benchmarks.synthetic import garment_rgba, graphic_rgba
+from compositing import BACKENDS, select_backend
+from csv_pipeline import composite_logo, logo_position, overlay_logo
+
+#Golden-image check: every render path and compositing backend against reference renders
+#made by a plain float kernel, with per-pixel max difference and PSNR thresholds
+#TO RUN: python -m benchmarks.golden --update   (once, on a known-good tree; then without --update)
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+MANIFEST_NAME = "manifest.json"
+
+# Synthetic inputs (fixed seeds, so every run renders the same pixels)
+GARMENT_SIZE = (600, 720)
+DESIGN_SIZE = (500, 430)
+LOGO_WIDTH = 150
+WRAP_INTENSITY = 30
+
+# Sheet coordinates of each case (x_coord 500 centers the logo, y_coord is its top edge)
+CASES = {
+    "center": {"x_coord": 500, "y_coord": None},
+    "custom": {"x_coord": 220, "y_coord": 410},
+    "clamp_top_left": {"x_coord": 10, "y_coord": -60},
+    "clamp_bottom_right": {"x_coord": 590, "y_coord": 700},
+}
+
+# (max per-pixel difference, min PSNR in dB) over the logo rectangle; every pixel
+# outside it must match the garment exactly. The fixed-point kernels round down
+# up to three times per pixel (premultiply, light map, blend), so they sit 2-3
+# levels from the float reference. The reference entry bounds drift of the
+# reference kernel itself (Pillow / OpenCV upgrades) against the saved fixtures.
+THRESHOLDS = {
+    "reference": (1, 60.0),
+    "overlay_logo": (3, 45.0),
+    "render_job": (3, 45.0),
+}
+
+def inputs():
+    """
+    Synthetic garment (RGBA) and design resized to LOGO_WIDTH with LANCZOS, as the CSV pipeline does.
+    """
+    garment = garment_rgba(*GARMENT_SIZE, seed=3)
+    design = Image.fromarray(graphic_rgba(*DESIGN_SIZE, complexity=0.6, seed=7))
+    logo_img = design.resize((LOGO_WIDTH, int(LOGO_WIDTH * design.height / design.width)), Image.Resampling.LANCZOS)
+    return garment, design, logo_img
+
+def logo_rect(garment, logo_img, position):
+    """
+    (x, y, w, h) of the logo on the garment: centered on position and clamped inside the image.
+    """
+    w, h = logo_img.size
+    x = max(0, min(garment.shape[1] - w, int(position[0] - w / 2)))
+    y = max(0, min(garment.shape[0] - h, int(position[1] - h / 2)))
+    return x, y, w, h
+
+def reference_overlay(garment, logo_img, position, apply_light_map=False, wrap_intensity=15):
+    """
+    The reference kernel: straight-alpha "over" in float64 with one rounding
+    at the end, and the light map wrap of apply_fabric_wrap_blend (the logo
+    rectangle's grayscale, normalized, blurred 21x21 and applied where above
+    0.5). Returns the RGB garment with the logo.
+    """
+    x, y, w, h = logo_rect(garment, logo_img, position)
+    fabric = np.ascontiguousarray(garment[y:y + h, x:x + w, :3])
+    logo = np.asarray(logo_img.convert("RGBA"), dtype=np.float64)
+    alpha = logo[:, :, 3:] / 255.0
+    premult = logo[:, :, :3] * alpha
+
+    if apply_light_map:
+        gray = cv2.cvtColor(fabric, cv2.COLOR_RGB2GRAY).astype(np.float64)
+        lo, hi = gray.min(), gray.max()
+        light = (gray - lo) / (hi - lo) if hi > lo else np.ones_like(gray)
+        light = cv2.GaussianBlur(light, (21, 21), 0)[:, :, None]
+        intensity = wrap_intensity / 100.0
+        premult = np.where(light > 0.5, premult * (1.0 - intensity + intensity * light), premult)
+
+    frame = garment[:, :, :3].copy()
+    frame[y:y + h, x:x + w] = np.clip(np.rint(premult + fabric * (1.0 - alpha)), 0, 255)
+    return frame
+
+def render_overlay_logo(garment, design, logo_img, position, apply_light_map):
+    # csv_pipeline.overlay_logo: untrimmed logo, per-row light map (apply_fabric_wrap_blend)
+    return overlay_logo(Image.fromarray(garment), logo_img, position, apply_light_map, WRAP_INTENSITY)
+
+def render_trimmed(garment, design, logo_img, position, apply_light_map):
+    # The render_job path: trimmed resize from the full design, garment-wide light planes
+    decoded = DecodedGarment.from_rgba(garment)
+    graphic = TrimmedGraphic.from_image(design).resize(LOGO_WIDTH, Image.Resampling.LANCZOS)
+    light_planes = None
+    if apply_light_map:
+        decoded.ensure_light_planes()
+        light_planes = (decoded.gray, decoded.light)
+    return composite_logo(decoded.bgr, graphic, position, apply_light_map, WRAP_INTENSITY, light_planes)
+
+# Render paths checked against the fixtures; add an entry here for every new fast path
+PATHS = {
+    "overlay_logo": render_overlay_logo,
+    "render_job": render_trimmed,
+}
+
+def render_with(backend, path, *args):
+    select_backend(backend)
+    return PATHS[path](*args)
+
+def fixture_name(case, apply_light_map):
+    return f"{case}_{'light' if apply_light_map else 'flat'}.png"
+
+def compare(expected, actual, rect):
+    """
+    (max difference inside rect, PSNR inside rect, max difference outside rect).
+    """
+    x, y, w, h = rect
+    diff = np.abs(expected.astype(np.int16) - actual.astype(np.int16))
+    inside = diff[y:y + h, x:x + w].copy()
+    mse = float(np.mean(inside.astype(np.float64) ** 2))
+    psnr = float("inf") if mse == 0 else float(10 * np.log10(255.0 ** 2 / mse))
+    diff[y:y + h, x:x + w] = 0
+    return int(inside.max()), psnr, int(diff.max())
+
+def update(folder):
+    """
+    Write the reference renders (logo rectangle only) and a manifest for every case.
+    """
+    garment, design, logo_img = inputs()
+    os.makedirs(folder, exist_ok=True)
+    manifest = {"garment_size": GARMENT_SIZE, "design_size": DESIGN_SIZE, "logo_width": LOGO_WIDTH,
+                "wrap_intensity": WRAP_INTENSITY, "cases": {}}
+    for case, coords in CASES.items():
+        position = logo_position(coords, *GARMENT_SIZE, logo_img.height)
+        x, y, w, h = logo_rect(garment, logo_img, position)
+        for light in (False, True):
+            frame = reference_overlay(garment, logo_img, position, light, WRAP_INTENSITY)
+            name = fixture_name(case, light)
+            Image.fromarray(frame[y:y + h, x:x + w]).save(os.path.join(folder, name))
+            manifest["cases"][name] = {"position": list(position), "rect": [x, y, w, h], "light_map": light}
+    with open(os.path.join(folder, MANIFEST_NAME), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
+
+def check(folder=GOLDEN_DIR, backends=None, paths=None):
+    """
+    Render every fixture case with the reference kernel and with each path
+    under each backend. Returns a list of result dicts (case, path, backend,
+    max_diff, psnr, outside_diff, ok).
+    """
+    with open(os.path.join(folder, MANIFEST_NAME), "r", encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    garment, design, logo_img = inputs()
+    backends = backends or list(BACKENDS)
+    paths = paths or list(PATHS)
+
+    results = []
+    for name, case in manifest["cases"].items():
+        position, rect, light = tuple(case["position"]), case["rect"], case["light_map"]
+        x, y, w, h = rect
+        # The saved crop back on the untouched garment, so pixels outside the logo are checked too
+        expected = garment[:, :, :3].copy()
+        expected[y:y + h, x:x + w] = np.asarray(Image.open(os.path.join(folder, name)).convert("RGB"))
+
+        renders = [("reference", "-", reference_overlay(garment, logo_img, position, light, WRAP_INTENSITY))]
+        for backend in backends:
+            for path in paths:
+                renders.append((path, backend, render_with(backend, path, garment, design, logo_img, position, light)))
+
+        for path, backend, actual in renders:
+            max_diff, psnr, outside = compare(expected, actual, rect)
+            limit = THRESHOLDS[path]
+            results.append({"case": name, "path": path, "backend": backend, "max_diff": max_diff,
+                            "psnr": psnr, "outside_diff": outside,
+                            "ok": max_diff <= limit[0] and psnr >= limit[1] and outside == 0})
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check render paths and backends against golden reference renders.")
+    parser.add_argument("--fixtures", default=GOLDEN_DIR, help="Folder of reference renders and manifest.json")
+    parser.add_argument("--update", action="store_true", help="Re-render the fixtures with the reference kernel")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="Only check this backend (repeatable)")
+    parser.add_argument("--path", action="append", choices=sorted(PATHS), help="Only check this render path (repeatable)")
+    args = parser.parse_args(argv)
+
+    if args.update:
+        manifest = update(args.fixtures)
+        print(f"Wrote {len(manifest['cases'])} reference renders to {args.fixtures}")
+        return
+
+    results = check(args.fixtures, args.backend, args.path)
+    print(f"{'case':>28} {'path':>14} {'backend':>8} {'max':>4} {'psnr':>7} {'outside':>7}")
+    for result in results:
+        flag = "" if result["ok"] else "  FAIL"
+        print(f"{result['case']:>28} {result['path']:>14} {result['backend']:>8} {result['max_diff']:>4} "
+              f"{result['psnr']:>7.2f} {result['outside_diff']:>7}{flag}")
+    failures = [result for result in results if not result["ok"]]
+    if failures:
+        print(f"{len(failures)} of {len(results)} renders outside the golden thresholds")
+        sys.exit(1)
+    print(f"All {len(results)} renders within the golden thresholds")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import os
+import sys
+import tempfile
+import warnings
+import zipfile
+
+from benchmarks.synthetic import write_benchmark_set
+from csv_pipeline import process_csv
+from job_sheet import read_sheet, validate_sheet
+
+#Sheet-layout check: variants of a synthetic job sheet with optional columns dropped must
+#render the same JPGs as the full sheet, and the dry run must count the rows that render
+#TO RUN: python -m benchmarks.sheet_check
+
+# Small assets; the check is about sheet columns, not pixels
+GARMENT_SIZE = (400, 480)
+GRAPHIC_SIZE = (300, 260)
+ROWS = 24
+
+# Variant name -> columns dropped from the full sheet (every row has a Style Number,
+# so without MPN the output names do not change)
+VARIANTS = {
+    "no_mpn": ["MPN"],
+    "no_coordinates": ["x coordinate", "y coordinate"],
+}
+
+def zip_entries(data, folder):
+    """
+    (name, bytes) of every entry process_csv writes for the sheet DataFrame
+    data, and the rows the dry run of the same sheet says would render.
+    """
+    sheet_path = os.path.join(folder, "variant.csv")
+    data.to_csv(sheet_path, index=False)
+    graphics_folder, garments_folder = os.path.join(folder, "Graphics"), os.path.join(folder, "Garments")
+    renderable = validate_sheet(read_sheet(sheet_path), graphics_folder, garments_folder)["renderable"]
+    zip_buffer = process_csv(sheet_path, False, 0, graphics_folder=graphics_folder,
+                             garments_folder=garments_folder, output_folder=os.path.join(folder, "Output"))
+    with zipfile.ZipFile(zip_buffer) as zip_file:
+        return [(info.filename, zip_file.read(info)) for info in zip_file.infolist()], renderable
+
+def check(folder):
+    """
+    Render and dry-run the full sheet and every variant. Returns a list of
+    result dicts (variant, rows, dry_run, same, error, ok); same compares
+    against the full sheet's ZIP, except no_coordinates, which only has to
+    render every row. dry_run is the dry run's renderable count, which must
+    equal rows.
+    """
+    sheet_path = write_benchmark_set(folder, ROWS, garment_size=GARMENT_SIZE, graphic_size=GRAPHIC_SIZE)
+    full = read_sheet(sheet_path)
+    expected = zip_entries(full, folder)[0]
+
+    results = []
+    for variant, columns in VARIANTS.items():
+        try:
+            entries, renderable = zip_entries(full.drop(columns=columns), folder)
+        except Exception as error:  # Report the failure and keep checking the other variants
+            results.append({"variant": variant, "rows": 0, "dry_run": 0, "same": False, "error": repr(error), "ok": False})
+            continue
+        rows = len(entries) - 1  # Minus missing_assets.csv
+        same = entries == expected if variant == "no_mpn" else rows == ROWS
+        results.append({"variant": variant, "rows": rows, "dry_run": renderable, "same": same, "error": "",
+                        "ok": same and renderable == rows})
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that job sheets without optional columns still render.")
+    parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder, warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        results = check(folder)
+    print(f"{'variant':>16} {'rows':>5} {'dry run':>7} {'same':>5}")
+    for result in results:
+        flag = "" if result["ok"] else f"  FAIL {result['error']}"
+        print(f"{result['variant']:>16} {result['rows']:>5} {result['dry_run']:>7} {str(result['same']):>5}{flag}")
+    failures = [result for result in results if not result["ok"]]
+    if failures:
+        print(f"{len(failures)} of {len(results)} sheet variants failed")
+        sys.exit(1)
+    print(f"All {len(results)} sheet variants render")
+
+if __name__ == "__main__":
+    main()
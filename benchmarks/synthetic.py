@@ -0,0 +1,130 @@
+import argparse
+import os
+import cv2
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+#Synthetic garments, designs and job sheets for the benchmarks (no real assets needed)
+#TO RUN: python -m benchmarks.synthetic --out /tmp/bench_assets --rows 500
+
+def garment_rgba(width, height, seed=0):
+    """
+    Fabric (flat colour, folds and weave noise) inside a garment-shaped alpha mask.
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    folds = 40 * np.sin(xx / 37.0) * np.cos(yy / 53.0)
+    base = rng.integers(30, 220, 3).astype(np.float32)
+    rgba = np.zeros((height, width, 4), dtype=np.uint8)
+    rgba[:, :, :3] = np.clip(base + folds[:, :, None] + rng.normal(0, 12, (height, width, 1)), 0, 255)
+
+    # Body plus sleeves, with anti-aliased edges like a cut-out product photo
+    mask = np.zeros((height, width), dtype=np.uint8)
+    cv2.rectangle(mask, (width // 4, height // 8), (3 * width // 4, height - height // 20), 255, -1)
+    sleeves = np.array([[width // 4, height // 8], [width // 20, height // 3], [width // 8, height * 2 // 5],
+                        [width // 4, height // 4], [3 * width // 4, height // 4], [7 * width // 8, height * 2 // 5],
+                        [19 * width // 20, height // 3], [3 * width // 4, height // 8]], dtype=np.int32)
+    cv2.fillPoly(mask, [sleeves[:4], sleeves[4:]], 255)
+    cv2.ellipse(mask, (width // 2, height // 8), (width // 10, height // 25), 0, 0, 360, 0, -1)  # Neck
+    rgba[:, :, 3] = cv2.GaussianBlur(mask, (5, 5), 0)
+    return rgba
+
+def graphic_rgba(width, height, complexity=0.5, margin=0.15, seed=1):
+    """
+    A design with a transparent margin around soft-edged artwork. complexity
+    (0-1) adds holes and strokes to the alpha plane: 0 gives one smooth
+    ellipse (mostly opaque / transparent tiles), 1 gives lettering-like
+    detail with many partially transparent edge tiles.
+    """
+    rng = np.random.default_rng(seed)
+    rgba = np.zeros((height, width, 4), dtype=np.uint8)
+    rgba[:, :, :3] = rng.integers(0, 256, 3)
+    left, top = int(width * margin), int(height * margin)
+    inner_w, inner_h = width - 2 * left, height - 2 * top
+
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    cv2.ellipse(alpha, (width // 2, height // 2), (inner_w // 2, inner_h // 2), 0, 0, 360, 255, -1)
+    # Colour bands so the artwork is not flat
+    for band in range(int(3 + 12 * complexity)):
+        y0 = top + band * inner_h // int(3 + 12 * complexity)
+        rgba[y0:, left:width - left, :3] = rng.integers(0, 256, 3)
+    for _ in range(int(400 * complexity)):
+        x, y = int(rng.integers(left, width - left)), int(rng.integers(top, height - top))
+        radius = int(rng.integers(2, max(3, min(inner_w, inner_h) // 25)))
+        if rng.random() < 0.5:
+            cv2.circle(alpha, (x, y), radius, 0, -1)
+        else:
+            end = (x + int(rng.integers(-5, 6)) * radius, y + int(rng.integers(-5, 6)) * radius)
+            cv2.line(alpha, (x, y), end, 0, max(1, radius // 2))
+    rgba[:, :, 3] = cv2.GaussianBlur(alpha, (3, 3), 0)
+    return rgba
+
+def write_assets(folder, garments=4, graphics=6, garment_size=(2000, 2400), graphic_size=(1500, 1300),
+                 complexity=0.5, seed=0):
+    """
+    Write Garments/ and Graphics/ PNGs under folder. Returns (garment names, graphic names).
+    """
+    garments_folder = os.path.join(folder, "Garments")
+    graphics_folder = os.path.join(folder, "Graphics")
+    os.makedirs(garments_folder, exist_ok=True)
+    os.makedirs(graphics_folder, exist_ok=True)
+
+    garment_names = [f"bench-garment-{i}" for i in range(garments)]
+    graphic_names = [f"bench-design-{i}" for i in range(graphics)]
+    for i, name in enumerate(garment_names):
+        Image.fromarray(garment_rgba(*garment_size, seed=seed + i)).save(os.path.join(garments_folder, f"{name}.png"))
+    for i, name in enumerate(graphic_names):
+        Image.fromarray(graphic_rgba(*graphic_size, complexity=complexity, seed=seed + 100 + i)).save(
+            os.path.join(graphics_folder, f"{name}.png"))
+    return garment_names, graphic_names
+
+def job_sheet(rows, garment_names, graphic_names, seed=0):
+    """
+    A job sheet DataFrame: every row a random design / garment pair with a
+    typical width and position (some centered, some with px coordinates).
+    """
+    rng = np.random.default_rng(seed)
+    centered = rng.random(rows) < 0.5
+    return pd.DataFrame({
+        "Design": rng.choice(graphic_names, rows),
+        "Garment": rng.choice(garment_names, rows),
+        "Style Number": [f"bench-{i}" for i in range(rows)],
+        "MPN": [f"bench-mpn-{i}" for i in range(rows)],
+        "Width": rng.choice([8, 10, 11, 12], rows),
+        "x coordinate": np.where(centered, "500px", [f"{x}px" for x in rng.integers(700, 1300, rows)]),
+        "y coordinate": np.where(centered, "", "217px"),
+    })
+
+def write_benchmark_set(folder, rows=200, garments=4, graphics=6, garment_size=(2000, 2400),
+                        graphic_size=(1500, 1300), complexity=0.5, seed=0):
+    """
+    Assets plus <folder>/sheet.csv. Returns the sheet path.
+    """
+    garment_names, graphic_names = write_assets(folder, garments, graphics, garment_size, graphic_size, complexity, seed)
+    sheet_path = os.path.join(folder, "sheet.csv")
+    job_sheet(rows, garment_names, graphic_names, seed).to_csv(sheet_path, index=False)
+    return sheet_path
+
+def parse_size(value):
+    width, height = (int(v) for v in value.split("x"))
+    return width, height
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic garments, designs and a job sheet.")
+    parser.add_argument("--out", required=True, help="Folder for Garments/, Graphics/ and sheet.csv")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--garments", type=int, default=4)
+    parser.add_argument("--graphics", type=int, default=6)
+    parser.add_argument("--garment-size", default="2000x2400", help="WxH")
+    parser.add_argument("--graphic-size", default="1500x1300", help="WxH")
+    parser.add_argument("--complexity", type=float, default=0.5, help="Alpha detail of the designs (0-1)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    sheet_path = write_benchmark_set(args.out, args.rows, args.garments, args.graphics, parse_size(args.garment_size),
+                                     parse_size(args.graphic_size), args.complexity, args.seed)
+    print(f"Wrote {sheet_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import time
+
+#Timing helper shared by the benchmarks
+
+def best_of(func, repeat):
+    """
+    Fastest of repeat calls of func() in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
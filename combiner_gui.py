@@ -5,6 +5,8 @@ from PIL import Image, ImageDraw, ImageFont
 import io
 from streamlit_drawable_canvas import st_canvas
 
+from compositing import apply_perspective_warp, composite_into
+
 def generate_displacement_map(apparel_img):
     gray = cv2.cvtColor(apparel_img, cv2.COLOR_BGR2GRAY)
     displacement = cv2.GaussianBlur(gray, (21, 21), 0)
@@ -46,38 +48,6 @@ def apply_fabric_wrap_blend(logo_img, apparel_img, alpha, position, intensity=0.
     blended_rgb = np.clip(blended_rgb * 255, 0, 255).astype(np.uint8)
     return blended_rgb
 
-#function to apply a perspective warp to the logo (e.g. 3/4 turn left)
-def apply_perspective_warp(logo_img, src_points, dest_points):
-    """
-    Applies a perspective warp to the logo image, preserving transparency.
-
-    :param logo_img: The logo image as a NumPy array with an alpha channel (RGBA).
-    :param src_points: Four source points (corners of the logo) as a list of (x, y) tuples.
-    :param dest_points: Four destination points (where the corners should map to) as a list of (x, y) tuples.
-    :return: The warped logo image as a NumPy array with an alpha channel (RGBA).
-    """
-    h, w = logo_img.shape[:2]
-    src = np.array(src_points, dtype=np.float32)
-    dest = np.array(dest_points, dtype=np.float32)
-
-    # Separate the RGB and alpha channels
-    rgb = logo_img[:, :, :3]
-    alpha = logo_img[:, :, 3]
-
-    # Compute the perspective transform matrix
-    matrix = cv2.getPerspectiveTransform(src, dest)
-
-    # Apply the perspective warp to the RGB channels
-    warped_rgb = cv2.warpPerspective(rgb, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
-
-    # Apply the perspective warp to the alpha channel
-    warped_alpha = cv2.warpPerspective(alpha, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
-
-    # Combine the warped RGB and alpha channels
-    warped_logo = np.dstack((warped_rgb, warped_alpha))
-
-    return warped_logo
-
 #main function to combine the image and logo
 def overlay_logo(apparel_img, logo_img, position, scale=0.3, wrap=False, wrap_intensity=15, perspective_points=None):
     #get images as arrays
@@ -90,7 +60,7 @@ def overlay_logo(apparel_img, logo_img, position, scale=0.3, wrap=False, wrap_in
     logo = cv2.resize(logo, (logo_w, logo_h), interpolation=cv2.INTER_AREA)
 
     #seperate the alpha channel from the logo
-    alpha = logo[:, :, 3] / 255.0
+    alpha = np.ascontiguousarray(logo[:, :, 3])
     logo_rgb = logo[:, :, :3][:, :, ::-1] #convert logo to BGR
     x, y = position
 
@@ -117,9 +87,8 @@ def overlay_logo(apparel_img, logo_img, position, scale=0.3, wrap=False, wrap_in
     ##### (logic1) (position of logo is top left corner of logo)################################
     roi = apparel[y:y+logo.shape[0], x:x+logo.shape[1]]
 
-    # Blend the logo into the apparel image
-    for c in range(3):
-        roi[:, :, c] = (logo_rgb[:, :, c] * alpha + roi[:, :, c] * (1 - alpha)).astype(np.uint8)
+    # Blend the logo into the apparel image (in place, fixed point)
+    composite_into(roi, logo_rgb, alpha, premultiplied=False)
 
     apparel[y:y+logo.shape[0], x:x+logo.shape[1]] = roi
     #####
@@ -1,6 +1,25 @@
 # Example using OpenCV for perspective transform
 import cv2
 import numpy as np
+import argparse
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asset_index import ASSET_EXTENSIONS
+from memory_budget import peak_rss_bytes, rss_mb
+from render_profile import RenderProfile, RowTimer
+
+#TO RUN: python combiner_opencv.py                      (front.png + front_g.png -> mockup_output.jpg)
+#        python combiner_opencv.py --input-dir Shots --output-dir Mockups --logo front_g.png
+
+# Threads per pipeline stage and images buffered between stages in batch mode. OpenCV
+# releases the GIL while decoding, filtering and encoding, so the stages overlap on threads.
+READ_THREADS = 4
+COMPUTE_THREADS = os.cpu_count() or 1
+WRITE_THREADS = 4
+QUEUE_SIZE = 16
 
 def warp_logo(logo, target_points):
     h, w = logo.shape[:2]
@@ -51,56 +70,193 @@ def apply_displacement_map(logo_img, displacement_map, intensity=10):
     displaced = cv2.remap(logo_img, map_x, map_y, interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
     return displaced
 
+# Logo resized for an apparel image, displaced by its fabric and blended in place
+def render_mockup(apparel, logo, position="center", scale=0.3, displacement_intensity=10, timer=None):
+    """
+    apparel is a BGR array (changed in place and returned), logo the BGR or
+    BGRA design as read by cv2.imread(..., cv2.IMREAD_UNCHANGED). position is
+    "center", "top_left" or the (x, y) of the logo's top-left corner.
+    """
+    timer = timer if timer is not None else RowTimer()
+
+    # Resize logo
+    with timer.stage("resize"):
+        logo_h = int(apparel.shape[0] * scale)
+        logo_w = int(logo.shape[1] * logo_h / logo.shape[0])
+        logo = cv2.resize(logo, (logo_w, logo_h), interpolation=cv2.INTER_AREA)
+
+    with timer.stage("blend"):
+        # Extract alpha channel from logo
+        if logo.shape[2] == 4:
+            alpha = logo[:, :, 3] / 255.0
+            logo_rgb = logo[:, :, :3]
+        else:
+            alpha = np.ones((logo.shape[0], logo.shape[1]))
+            logo_rgb = logo
+
+        # Generate displacement map from apparel
+        displacement = generate_displacement_map(apparel)
+        displaced_logo = apply_displacement_map(logo_rgb, displacement, intensity=displacement_intensity)
+
+        # Blend logo with apparel
+        if position == "center":
+            x = (apparel.shape[1] - logo_w) // 2
+            y = (apparel.shape[0] - logo_h) // 2
+        elif position == "top_left":
+            x, y = 50, 50  #tweak
+        else:
+            x, y = position
+
+        # All three channels in one pass (same float64 math as blending them one by one)
+        roi = apparel[y:y+logo_h, x:x+logo_w]
+        alpha = alpha[:, :, None]
+        roi[:] = (displaced_logo * alpha + roi * (1 - alpha)).astype(np.uint8)
+    timer.count("blend", displaced_logo.nbytes)
+    return apparel
+
 def overlay_logo_on_apparel(apparel_path, logo_path, output_path, position="center", scale=0.3, displacement_intensity=10):
     # Load images
     apparel = cv2.imread(apparel_path, cv2.IMREAD_COLOR)
     logo = cv2.imread(logo_path, cv2.IMREAD_UNCHANGED)  # Keep alpha channel
 
-    # Resize logo
-    logo_h = int(apparel.shape[0] * scale)
-    logo_w = int(logo.shape[1] * logo_h / logo.shape[0])
-    logo = cv2.resize(logo, (logo_w, logo_h), interpolation=cv2.INTER_AREA)
-
-    # Extract alpha channel from logo
-    if logo.shape[2] == 4:
-        alpha = logo[:, :, 3] / 255.0
-        logo_rgb = logo[:, :, :3]
-    else:
-        alpha = np.ones((logo.shape[0], logo.shape[1]))
-        logo_rgb = logo
-
-    # Generate displacement map from apparel
-    displacement = generate_displacement_map(apparel)
-    displaced_logo = apply_displacement_map(logo_rgb, displacement, intensity=displacement_intensity)
-
-    # Blend logo with apparel
-    if position == "center":
-        x = (apparel.width - logo.width) // 2
-        y = (apparel.height - logo.height) // 2
-    elif position == "top_left":
-        x, y = 50, 50  #tweak
-    else:
-        x, y = position
-    
-    roi = apparel[y:y+logo_h, x:x+logo_w]
-
-    for c in range(3):
-        roi[:, :, c] = (displaced_logo[:, :, c] * alpha + roi[:, :, c] * (1 - alpha)).astype(np.uint8)
-
-    apparel[y:y+logo_h, x:x+logo_w] = roi
+    render_mockup(apparel, logo, position, scale, displacement_intensity)
 
     # Save output
     cv2.imwrite(output_path, apparel)
 
-def main():
-    overlay_logo_on_apparel(
-        apparel_path="front.png",
-        logo_path="front_g.png",
-        output_path="mockup_output.jpg",
-        position=(150, 100),
-        scale=0.25,
-        displacement_intensity=20
+# End of input for a stage's threads
+_DONE = object()
+
+def _stage(pool, threads, func, inbox, outbox, errors):
+    # threads loops on pool taking (name, timer, value) from inbox until _DONE; results go to outbox
+    def work():
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                return
+            name, timer, value = item
+            try:
+                result = func(name, timer, value)
+            except Exception as exc:  # One bad image should not stop the batch
+                errors.append((name, repr(exc)))
+                continue
+            if outbox is not None:
+                outbox.put((name, timer, result))
+    return [pool.submit(work) for _ in range(threads)]
+
+def batch_overlay(input_dir, output_dir, logo_path, position="center", scale=0.3, displacement_intensity=10,
+                  extension=".jpg", read_threads=READ_THREADS, compute_threads=COMPUTE_THREADS,
+                  write_threads=WRITE_THREADS, queue_size=QUEUE_SIZE):
+    """
+    Overlay one logo on every image in input_dir (not recursive) and write
+    <name><extension> to output_dir. Read/decode, resize + displacement +
+    blend and cv2.imwrite encode run as pipeline stages on their own thread
+    pools, connected by queues of at most queue_size images, so about
+    2 * queue_size images plus one per compute / write thread are decoded at once. Returns a stats
+    dict: images, failed [(name, error)], seconds, images_per_second,
+    peak_rss_mb and the stage profile (see render_profile.RenderProfile).
+    """
+    logo = cv2.imread(logo_path, cv2.IMREAD_UNCHANGED)  # Keep alpha channel
+    if logo is None:
+        raise FileNotFoundError(logo_path)
+    os.makedirs(output_dir, exist_ok=True)
+    names = sorted(entry.name for entry in os.scandir(input_dir)
+                   if entry.is_file() and os.path.splitext(entry.name)[1].lower() in ASSET_EXTENSIONS)
+
+    def read(name, timer, path):
+        with timer.stage("decode"):
+            apparel = cv2.imread(path, cv2.IMREAD_COLOR)
+        if apparel is None:
+            raise ValueError("not a readable image")
+        timer.count("decode", apparel.nbytes)
+        return apparel
+
+    def compute(name, timer, apparel):
+        return render_mockup(apparel, logo, position, scale, displacement_intensity, timer)
+
+    def write(name, timer, apparel):
+        output_path = os.path.join(output_dir, os.path.splitext(name)[0] + extension)
+        with timer.stage("encode"):
+            if not cv2.imwrite(output_path, apparel):
+                raise OSError(f"could not write {output_path}")
+        timer.count("encode", os.path.getsize(output_path))
+        profile.add(name, os.path.basename(output_path), timer)
+
+    profile = RenderProfile()
+    errors = []
+    paths = queue.Queue(maxsize=queue_size)
+    decoded = queue.Queue(maxsize=queue_size)
+    rendered = queue.Queue(maxsize=queue_size)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(read_threads) as readers, ThreadPoolExecutor(compute_threads) as computers, \
+            ThreadPoolExecutor(write_threads) as writers:
+        stages = [
+            (_stage(readers, read_threads, read, paths, decoded, errors), decoded, compute_threads),
+            (_stage(computers, compute_threads, compute, decoded, rendered, errors), rendered, write_threads),
+            (_stage(writers, write_threads, write, rendered, None, errors), None, 0),
+        ]
+        for name in names:
+            paths.put((name, RowTimer(), os.path.join(input_dir, name)))
+        for _ in range(read_threads):
+            paths.put(_DONE)
+        # Once a stage's threads have drained their queue, the next stage's threads are told to stop
+        for futures, outbox, next_threads in stages:
+            for future in futures:
+                future.result()
+            for _ in range(next_threads):
+                outbox.put(_DONE)
+    seconds = time.perf_counter() - start
+
+    return {
+        "images": len(profile),
+        "failed": errors,
+        "seconds": round(seconds, 3),
+        "images_per_second": round(len(profile) / seconds, 2) if seconds > 0 else 0.0,
+        "peak_rss_mb": rss_mb(peak_rss_bytes()),
+        "profile": profile.report(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Overlay a logo on apparel shots with a fabric displacement map.")
+    parser.add_argument("--input-dir", help="Batch mode: folder of apparel images")
+    parser.add_argument("--output-dir", help="Batch mode: where the mockups are written")
+    parser.add_argument("--logo", default="front_g.png", help="Batch mode: logo image (PNG with alpha)")
+    parser.add_argument("--position", default="center", help="center, top_left or x,y of the logo's top-left corner")
+    parser.add_argument("--scale", type=float, default=0.25, help="Logo height relative to the apparel image")
+    parser.add_argument("--intensity", type=int, default=20, help="Displacement intensity in pixels")
+    parser.add_argument("--extension", default=".jpg", help="Output format, by file extension")
+    parser.add_argument("--read-threads", type=int, default=READ_THREADS)
+    parser.add_argument("--compute-threads", type=int, default=COMPUTE_THREADS)
+    parser.add_argument("--write-threads", type=int, default=WRITE_THREADS)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Images buffered between stages")
+    args = parser.parse_args(argv)
+    position = args.position
+    if "," in position:
+        position = tuple(int(v) for v in position.split(","))
+
+    if not args.input_dir:
+        # Single example pair
+        overlay_logo_on_apparel(
+            apparel_path="front.png",
+            logo_path="front_g.png",
+            output_path="mockup_output.jpg",
+            position=(150, 100),
+            scale=0.25,
+            displacement_intensity=20
+        )
+        return
+
+    stats = batch_overlay(
+        args.input_dir, args.output_dir or "Mockups", args.logo, position=position, scale=args.scale,
+        displacement_intensity=args.intensity, extension=args.extension, read_threads=args.read_threads,
+        compute_threads=args.compute_threads, write_threads=args.write_threads, queue_size=args.queue_size
     )
+    print(f"{stats['images']} images in {stats['seconds']}s ({stats['images_per_second']} images/s), "
+          f"peak RSS {stats['peak_rss_mb']} MB")
+    for stage, totals in stats["profile"]["stages"].items():
+        print(f"{stage}: {totals['seconds']:.2f}s busy (p50 {totals['p50_ms']:.1f} ms, p95 {totals['p95_ms']:.1f} ms)")
+    for name, error in stats["failed"]:
+        print(f"failed: {name}: {error}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
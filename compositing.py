@@ -0,0 +1,372 @@
+import cv2
+import numpy as np
+from PIL import Image, ImageChops
+import time
+
+#Pixel kernels shared by the combiner scripts and csv_pipeline
+
+# Blend the (pre-multiplied BGR) logo with a normalized light map
+def blend_light_map(logo_img, light_map, intensity):
+    """
+    Light map wrap for a uint8 logo: where the light map is above 0.5 each
+    channel becomes rgb * (1 - intensity) + rgb * light * intensity, elsewhere
+    it is kept.
+
+    Output is byte-for-byte that of the old per-channel np.where loop: every
+    operation keeps its operand dtypes (float32 pixels, the product in the
+    light map's precision, one rounding of the sum to float32), and unlit
+    pixels come back unchanged because v / 255 * 255 truncates to v for every
+    byte. Rows are blended in strips through buffers reused by every strip,
+    rgb and rgb * (1 - intensity) are 256-entry lookups, and strips without
+    a lit pixel are skipped. intensity is taken as a Python float so a NumPy
+    scalar cannot promote the blend to float64.
+    """
+    intensity = float(intensity)
+    unlit_term = _BYTE_TO_FLOAT * (1.0 - intensity)
+    product_dtype = np.float64 if light_map.dtype == np.float64 else np.float32
+    depth = cv2.CV_64F if product_dtype == np.float64 else cv2.CV_32F
+
+    height, width = light_map.shape
+    strip_shape = (min(height, max(1, LIGHT_STRIP_PIXELS // max(1, width))), width, 3)
+    rgb_buf, unlit_buf, blended_buf = (np.empty(strip_shape, dtype=np.float32) for _ in range(3))
+    light_buf = np.empty(strip_shape, dtype=light_map.dtype)
+    lit_buf = np.empty(strip_shape, dtype=product_dtype)
+    byte_buf = np.empty(strip_shape, dtype=np.uint8)
+
+    blended_img = np.array(logo_img)
+    for rows in _strips(light_map, LIGHT_STRIP_PIXELS):
+        light = np.ascontiguousarray(light_map[rows])
+        lit = (light > 0.5).view(np.uint8)
+        if not lit.any():
+            continue
+        logo = np.ascontiguousarray(logo_img[rows])
+        count = len(light)  # The last strip may be shorter
+
+        rgb = cv2.LUT(logo, _BYTE_TO_FLOAT, dst=rgb_buf[:count])
+        lit_term = cv2.multiply(rgb, cv2.merge([light, light, light], dst=light_buf[:count]),
+                                dst=lit_buf[:count], dtype=depth)
+        lit_term *= intensity
+        # Summed in the light map's precision, rounded once to float32
+        blended = cv2.add(lit_term, cv2.LUT(logo, unlit_term, dst=unlit_buf[:count]),
+                          dst=blended_buf[:count], dtype=cv2.CV_32F)
+
+        # Back to uint8 (truncating) - no need to recombine with alpha as we'll do that later
+        blended *= 255
+        np.clip(blended, 0, 255, out=blended)
+        np.copyto(byte_buf[:count], blended, casting="unsafe")
+        cv2.copyTo(byte_buf[:count], lit, blended_img[rows])
+    return blended_img
+
+#function to apply a perspective warp to the logo (e.g. 3/4 turn left)
+def apply_perspective_warp(logo_img, src_points, dest_points):
+    """
+    Applies a perspective warp to the logo image, preserving transparency.
+
+    :param logo_img: The logo image as a NumPy array with an alpha channel (RGBA).
+    :param src_points: Four source points (corners of the logo) as a list of (x, y) tuples.
+    :param dest_points: Four destination points (where the corners should map to) as a list of (x, y) tuples.
+    :return: The warped logo image as a NumPy array with an alpha channel (RGBA).
+    """
+    h, w = logo_img.shape[:2]
+    src = np.array(src_points, dtype=np.float32)
+    dest = np.array(dest_points, dtype=np.float32)
+
+    # Separate the RGB and alpha channels
+    rgb = logo_img[:, :, :3]
+    alpha = logo_img[:, :, 3]
+
+    # Compute the perspective transform matrix
+    matrix = cv2.getPerspectiveTransform(src, dest)
+
+    # Apply the perspective warp to the RGB channels
+    warped_rgb = cv2.warpPerspective(rgb, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+
+    # Apply the perspective warp to the alpha channel
+    warped_alpha = cv2.warpPerspective(alpha, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+    # Combine the warped RGB and alpha channels
+    warped_logo = np.dstack((warped_rgb, warped_alpha))
+
+    return warped_logo
+
+#Fixed-point alpha compositing. Products of two 8-bit values fit in uint16
+#(255 * 255 = 65025), and _div255 divides them by 255 exactly (rounding down),
+#so results are floor(exact value): never more than 1 level away from the old
+#float64 "/ 255.0" code, which sometimes landed just under an integer and
+#truncated one level low. No float buffers are allocated.
+
+# Pixels per composite_into strip (about 200 KB of uint16 temporaries)
+STRIP_PIXELS = 32 * 1024
+
+# Pixels per blend_light_map strip (float64 temporaries of about 200 KB each,
+# small enough to stay in cache and off the allocator's mmap path)
+LIGHT_STRIP_PIXELS = 8 * 1024
+
+# Every byte value as float32 / 255 (blend_light_map's normalized pixels)
+_BYTE_TO_FLOAT = np.arange(256, dtype=np.float32) / 255.0
+
+# floor(values / 255) in place, exact for 0 <= values <= 255 * 255 (uint16)
+def _div255(values):
+    values += values >> 8
+    values += 1
+    values >>= 8
+    return values
+
+# Alpha plane repeated for the three colour channels (faster than broadcasting)
+def _expand_alpha(alpha):
+    return cv2.merge([alpha, alpha, alpha])
+
+def premultiply_alpha(bgr, alpha):
+    """
+    BGR (uint8) multiplied by alpha (uint8, 0-255), as a new uint8 array.
+    """
+    premult = np.multiply(bgr, _expand_alpha(alpha), dtype=np.uint16)
+    return _div255(premult).astype(np.uint8)
+
+def composite_into(roi, logo_bgr, alpha, premultiplied=True):
+    """
+    Alpha-blend a logo into roi (a uint8 BGR view of the garment) in place.
+
+    premultiplied=True:  roi = logo + roi * (255 - alpha) / 255   (logo already times alpha)
+    premultiplied=False: roi = (logo * alpha + roi * (255 - alpha)) / 255
+    The logo and alpha must have the roi's height and width. Results are
+    saturated at 255 (a light map wrap can lift a pre-multiplied pixel above its alpha).
+    Rows are blended in strips so the uint16 temporaries stay small and in cache.
+    """
+    for rows in _strips(alpha):
+        _composite_strip(roi[rows], logo_bgr[rows], alpha[rows], premultiplied)
+    return roi
+
+# Row slices covering an image in strips of about strip_pixels pixels
+def _strips(image, strip_pixels=STRIP_PIXELS):
+    height, width = image.shape[:2]
+    strip_rows = max(1, strip_pixels // max(1, width))
+    for top in range(0, height, strip_rows):
+        yield slice(top, top + strip_rows)
+
+def _composite_strip(roi, logo_bgr, alpha, premultiplied):
+    blended = np.multiply(roi, _expand_alpha(255 - alpha), dtype=np.uint16)
+    if premultiplied:
+        _div255(blended)
+        blended += logo_bgr
+    else:
+        blended += np.multiply(logo_bgr, _expand_alpha(alpha), dtype=np.uint16)
+        _div255(blended)
+    np.copyto(roi, cv2.convertScaleAbs(blended))  # Saturating uint16 -> uint8
+
+#Sparse-alpha compositing. Most of a logo is fully transparent or fully opaque,
+#so AlphaRegions splits the alpha plane into TILE x TILE tiles once (per resized
+#graphic) and CompositingBackend.composite only runs the blend on tiles with
+#partial alpha. Opaque tiles are copied and transparent ones skipped; the result
+#is identical to blending the whole logo.
+
+# Tile edge in pixels for AlphaRegions
+TILE = 64
+
+class AlphaRegions:
+    """
+    Alpha plane classified tile by tile. transparent, opaque and edge are
+    lists of (row slice, column slice) spans; neighbouring tiles of the same
+    kind in a tile row are merged into one span.
+    """
+    def __init__(self, shape, transparent, opaque, edge, counts):
+        self.shape = shape
+        self.transparent = transparent
+        self.opaque = opaque
+        self.edge = edge
+        self.counts = counts
+
+    @classmethod
+    def from_alpha(cls, alpha, tile=TILE):
+        height, width = alpha.shape[:2]
+        row_starts = np.arange(0, height, tile)
+        col_starts = np.arange(0, width, tile)
+        if not len(row_starts) or not len(col_starts):
+            return cls(alpha.shape[:2], [], [], [], {"transparent": 0, "opaque": 0, "edge": 0})
+        # Min / max alpha of every tile
+        tile_min = np.minimum.reduceat(np.minimum.reduceat(alpha, row_starts, axis=0), col_starts, axis=1)
+        tile_max = np.maximum.reduceat(np.maximum.reduceat(alpha, row_starts, axis=0), col_starts, axis=1)
+        # 0 = transparent, 1 = opaque, 2 = edge band
+        kinds = np.full(tile_min.shape, 2, dtype=np.uint8)
+        kinds[tile_max == 0] = 0
+        kinds[tile_min == 255] = 1
+
+        spans = {0: [], 1: [], 2: []}
+        for tile_row, top in enumerate(row_starts):
+            rows = slice(int(top), int(top) + tile)
+            kind_row = kinds[tile_row]
+            # Column tiles where the kind changes start a new span
+            breaks = np.flatnonzero(np.diff(kind_row)) + 1
+            for start, stop in zip(np.r_[0, breaks], np.r_[breaks, len(kind_row)]):
+                spans[int(kind_row[start])].append((rows, slice(int(start) * tile, int(stop) * tile)))
+        counts = {name: int((kinds == kind).sum()) for kind, name in enumerate(("transparent", "opaque", "edge"))}
+        return cls(alpha.shape[:2], spans[0], spans[1], spans[2], counts)
+
+def flatten_onto_white(frame, alpha, regions=None):
+    """
+    Flatten a uint8 colour frame with a separate alpha plane onto white, in
+    place. Pixels are exactly those of PIL's alpha_composite over an opaque
+    white image followed by convert("RGB"), i.e. for every channel
+    (c * alpha + 255 * (255 - alpha) + 128) / 255 with PIL's rounding.
+    With the alpha plane's AlphaRegions only edge tiles are computed:
+    transparent tiles are filled with white and opaque ones are left as they are.
+    """
+    if regions is None:
+        spans = [(slice(None), slice(None))]
+    else:
+        for rows, cols in regions.transparent:
+            frame[rows, cols] = 255
+        spans = regions.edge
+    for span_rows, cols in spans:
+        span, span_alpha = frame[span_rows, cols], alpha[span_rows, cols]
+        for rows in _strips(span_alpha):
+            _flatten_strip(span[rows], span_alpha[rows])
+    return frame
+
+def _flatten_strip(frame, alpha):
+    flat = np.multiply(frame, _expand_alpha(alpha), dtype=np.uint16)
+    background = np.multiply(255 - alpha, 255, dtype=np.uint16)
+    background += 128
+    flat += _expand_alpha(background)
+    # Rounded division by 255 as PIL does it (SHIFTFORDIV255); at most 65407, no overflow
+    flat += flat >> 8
+    flat >>= 8
+    np.copyto(frame, flat, casting="unsafe")
+
+#Compositing backends. Each one blends a pre-multiplied logo into a garment ROI in
+#place (only on the tiles that need it when AlphaRegions are given); select_backend()
+#times them on representative logos once per process ("auto") or honours a forced choice.
+#Backends with the same `pixels` value give byte-identical output.
+
+class CompositingBackend:
+    """
+    Pre-multiplied blend into a uint8 BGR view, in place. Opaque tiles are
+    copied and transparent ones skipped when AlphaRegions are given.
+    """
+    name = None
+    pixels = "fixed-point"
+
+    def composite(self, roi, logo_bgr, alpha, regions=None):
+        if regions is None:
+            self.blend(roi, logo_bgr, alpha)
+            return roi
+        for rows, cols in regions.opaque:
+            roi[rows, cols] = logo_bgr[rows, cols]
+        for rows, cols in regions.edge:
+            self.blend(roi[rows, cols], logo_bgr[rows, cols], alpha[rows, cols])
+        return roi
+
+    def blend(self, roi, logo_bgr, alpha):
+        raise NotImplementedError
+
+class NumpyBackend(CompositingBackend):
+    """
+    composite_into: uint16 fixed point in row strips.
+    """
+    name = "numpy"
+
+    def blend(self, roi, logo_bgr, alpha):
+        composite_into(roi, logo_bgr, alpha)
+
+class OpenCVBackend(CompositingBackend):
+    """
+    The same arithmetic with OpenCV's saturating SIMD ops. floor(t / 255) is
+    computed as round((t - 127) / 255), so pixels match NumpyBackend exactly.
+    """
+    name = "opencv"
+
+    def blend(self, roi, logo_bgr, alpha):
+        blended = cv2.multiply(roi, _expand_alpha(255 - alpha), dtype=cv2.CV_16U)
+        blended = cv2.subtract(blended, (127.0, 127.0, 127.0, 0.0))
+        blended = cv2.convertScaleAbs(blended, alpha=1 / 255.0)
+        np.copyto(roi, cv2.add(blended, np.ascontiguousarray(logo_bgr)))
+
+class PillowBackend(CompositingBackend):
+    """
+    Image.paste of black through the alpha mask, then ImageChops.add of the
+    logo. Pillow rounds where the fixed-point kernels round down, so pixels
+    can be 1 level higher.
+    """
+    name = "pillow"
+    pixels = "pillow"
+
+    def blend(self, roi, logo_bgr, alpha):
+        height, width = alpha.shape
+        base = Image.fromarray(np.ascontiguousarray(roi))
+        base.paste((0, 0, 0), (0, 0, width, height), Image.fromarray(np.ascontiguousarray(alpha)))
+        np.copyto(roi, np.asarray(ImageChops.add(base, Image.fromarray(np.ascontiguousarray(logo_bgr)))))
+
+BACKENDS = {backend.name: backend for backend in (NumpyBackend, OpenCVBackend, PillowBackend)}
+
+# Logo widths timed by calibrate() (small, typical and large print widths)
+CALIBRATION_WIDTHS = (185, 370, 740)
+
+# Backend chosen for this process and the calibration timings (see select_backend)
+_active = None
+_timings = None
+
+def calibration_sample(width, seed=0):
+    """
+    Soft-edged ellipse on random colours: transparent corners, opaque middle
+    and an antialiased edge band, like a real design.
+    """
+    height = int(width * 0.85)
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    inside = ((xx - width / 2) / (width / 2)) ** 2 + ((yy - height / 2) / (height / 2)) ** 2
+    alpha = np.clip((1.0 - inside) * 1024, 0, 255).astype(np.uint8)
+    logo = premultiply_alpha(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), alpha)
+    garment = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return garment, logo, alpha, AlphaRegions.from_alpha(alpha)
+
+def calibrate(widths=CALIBRATION_WIDTHS, repeat=3):
+    """
+    Time every available backend on synthetic logos of the given widths and
+    return {name: total seconds} (best of `repeat` per width).
+    """
+    timings = {}
+    samples = [calibration_sample(width) for width in widths]
+    for name, backend_class in BACKENDS.items():
+        backend = backend_class()
+        total = 0.0
+        for garment, logo, alpha, regions in samples:
+            best = float("inf")
+            for _ in range(repeat):
+                roi = garment.copy()
+                start = time.perf_counter()
+                backend.composite(roi, logo, alpha, regions)
+                best = min(best, time.perf_counter() - start)
+            total += best
+        timings[name] = total
+    return timings
+
+def select_backend(name="auto"):
+    """
+    Set and return the backend used by active_backend(). "auto" calibrates
+    once per process and keeps the fastest; a backend name forces that one.
+    """
+    global _active, _timings
+    if name == "auto":
+        if _timings is None:
+            _timings = calibrate()
+        name = min(_timings, key=_timings.get)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown compositing backend {name!r} (choose from auto, {', '.join(BACKENDS)})")
+    if _active is None or _active.name != name:
+        _active = BACKENDS[name]()
+    return _active
+
+def calibration_timings():
+    """
+    {backend name: seconds} from the last "auto" selection, or None.
+    """
+    return _timings
+
+def active_backend():
+    """
+    The selected backend, NumpyBackend until select_backend() is called.
+    """
+    global _active
+    if _active is None:
+        _active = NumpyBackend()
+    return _active
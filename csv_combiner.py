@@ -7,6 +7,8 @@ import os
 import zipfile
 import pandas as pd
 
+from compositing import blend_light_map
+
 #TO RUN: streamlit run csv_combiner.py
 
 # Ensure the script connects to the correct folders
@@ -132,22 +134,7 @@ def apply_fabric_wrap_blend(logo_img, apparel_img, alpha, position, intensity=0.
     # Apply Gaussian blur to smooth the light map
     light_map = cv2.GaussianBlur(light_map, (21, 21), 0)
 
-    # Normalize RGB to [0, 1]
-    rgb = logo_img.astype(np.float32) / 255.0  # Already BGR format
-
-    # Apply blending: combine the logo with the light map
-    blended_rgb = np.zeros_like(rgb)
-    for c in range(3):  # Loop over RGB channels
-        # Preserve original colors where light map intensity is low
-        blended_rgb[:, :, c] = np.where(
-            light_map > 0.5,  # Apply blending only where light map intensity is high
-            rgb[:, :, c] * (1.0 - intensity) + rgb[:, :, c] * light_map * intensity,
-            rgb[:, :, c]  # Preserve original color
-        )
-
-    # Convert back to uint8 - no need to recombine with alpha as we'll do that later
-    blended_rgb = np.clip(blended_rgb * 255, 0, 255).astype(np.uint8)
-    return blended_rgb
+    return blend_light_map(logo_img, light_map, intensity)
 
 #main function to combine the image and logo
 def overlay_logo(apparel_img, logo_img, position, apply_light_map=False, wrap_intensity=15):
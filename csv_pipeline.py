@@ -0,0 +1,778 @@
+import cv2
+import numpy as np
+from PIL import Image
+import argparse
+import collections
+import functools
+import io
+import os
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from asset_cache import GarmentCache, GraphicCache, ResizedGraphic
+from asset_index import AssetIndex
+from asset_store import AssetStore
+from compositing import BACKENDS, active_backend, blend_light_map, calibration_timings, flatten_onto_white, select_backend
+from garment_store import SharedGarmentStore, attach_garments, shared_garment
+from job_sheet import chunk_jobs, read_sheet, read_sheet_chunks, validate_sheet
+from journal import RunJournal, job_hash, journal_paths, latest_run
+from memory_budget import (PROCESS_BASE_BYTES, budgeted_map, garment_footprint, job_footprint, peak_rss_bytes,
+                           reset_peak_rss, rss_mb)
+from render_cache import RenderCache, file_digest
+from render_profile import RenderProfile, RowTimer, profile_path
+from scheduler import reuse_report, schedule_jobs
+from zip_writer import StreamingZipWriter
+
+#Headless rendering core for csv_combinerv2.py (no Streamlit import)
+#TO RUN: python csv_pipeline.py "250701 Image Script Test.csv" --output-dir Output
+
+# Ensure the script connects to the correct folders
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+GRAPHICS_FOLDER = os.path.join(CURRENT_DIR, "Graphics")
+GARMENTS_FOLDER = os.path.join(CURRENT_DIR, "Garments")
+OUTPUT_FOLDER = os.path.join(CURRENT_DIR, "Output")
+RENDER_CACHE_FOLDER = os.path.join(CURRENT_DIR, "RenderCache")
+ASSET_STORE_FOLDER = os.path.join(CURRENT_DIR, "AssetStore")
+
+# Adjustable pixels per inch value
+PIXELS_PER_INCH = 96  # Default value, can be adjusted as needed
+
+# Bump when a change alters rendered pixels (invalidates render cache and journal entries)
+RENDERER_VERSION = 3
+
+# Byte limits of the asset caches when a run has no memory budget: (garments, resized designs, trimmed designs)
+CACHE_LIMITS = (None, 128 * 1024 * 1024, 256 * 1024 * 1024)
+
+# Decoded garments (RGBA, BGR, alpha) kept between rows and between runs in this process
+GARMENT_CACHE = GarmentCache(max_entries=16, max_bytes=CACHE_LIMITS[0])
+# Resized, pre-multiplied designs keyed by (design, width, resampling mode)
+GRAPHIC_CACHE = GraphicCache(max_bytes=CACHE_LIMITS[1], max_source_bytes=CACHE_LIMITS[2])
+
+# Function to create and save an alpha mask
+def save_alpha_mask(image, output_path):
+    """
+    Save the alpha mask of the given image.
+    """
+    alpha = image.split()[-1]  # Extract the alpha channel
+    alpha.save(output_path)
+
+# Calculate the logo width in pixels based on the Width column
+def logo_width(job):
+    #OLD LOGO WIDTH CALC
+    return int((job["width"] / 12) * 370)
+
+# Center of the logo on the garment from the row's coordinates
+def logo_position(job, garment_width, garment_height, logo_height_pixels):
+    # Determine logo position
+    if job["x_coord"] == 500:
+        center_x = garment_width // 2
+    else:
+        center_x = job["x_coord"]
+
+    if job["y_coord"] is not None:
+        # y_coord is the top of the logo, so center_y = y_coord + logo_height // 2
+        center_y = job["y_coord"] + logo_height_pixels // 2
+    else:
+        # Default: center vertically minus 40 (as before)
+        center_y = garment_height // 2 - 40
+
+    return (center_x, center_y)
+
+# Image size from the PNG header only, memoized per (path, mtime)
+@functools.lru_cache(maxsize=4096)
+def _image_size(path, mtime_ns):
+    with Image.open(path) as img:
+        return img.size
+
+# (garment width, height) and (logo width, height) of a job, from the PNG headers
+def job_sizes(job):
+    garment_size = _image_size(job["garment_path"], os.stat(job["garment_path"]).st_mtime_ns)
+    graphic_width, graphic_height = _image_size(job["graphic_path"], os.stat(job["graphic_path"]).st_mtime_ns)
+    width_pixels = logo_width(job)
+    return garment_size, (width_pixels, int(width_pixels * (graphic_height / graphic_width)))
+
+# Render cache key: asset bytes, computed logo width and position, light map settings,
+# format and the compositing backend's pixel family
+def render_key(job, apply_light_map, wrap_intensity):
+    (garment_width, garment_height), (width_pixels, height_pixels) = job_sizes(job)
+    return RenderCache.key(
+        garment=file_digest(job["garment_path"]),
+        graphic=file_digest(job["graphic_path"]),
+        logo_size=(width_pixels, height_pixels),
+        position=logo_position(job, garment_width, garment_height, height_pixels),
+        apply_light_map=bool(apply_light_map),
+        wrap_intensity=wrap_intensity if apply_light_map else 0,
+        format="jpeg-95",
+        renderer=RENDERER_VERSION,
+        compositor=active_backend().pixels,
+    )
+
+# Decode assets from their PNGs (store=None) or memory-map them from an AssetStore
+def use_asset_store(store):
+    GARMENT_CACHE.store = store
+    GRAPHIC_CACHE.store = store
+
+# Byte limits (garments, resized designs, trimmed designs) of this process's asset caches
+def set_cache_limits(limits):
+    garment_bytes, graphic_bytes, source_bytes = limits
+    GARMENT_CACHE.limit(garment_bytes)
+    GRAPHIC_CACHE.limit(graphic_bytes)
+    GRAPHIC_CACHE.sources.limit(source_bytes)
+
+# Pool worker setup: same compositing backend, asset store and cache limits as the parent, shared garments attached
+def init_worker(garment_descriptor, compositor, asset_store_dir=None, cache_limits=CACHE_LIMITS):
+    select_backend(compositor)
+    use_asset_store(AssetStore(asset_store_dir) if asset_store_dir else None)
+    set_cache_limits(cache_limits)
+    attach_garments(garment_descriptor)
+
+# Fit a run into a memory budget using only its assets' dimensions (nothing is decoded)
+def plan_memory(jobs, budget_bytes, workers, apply_light_map, share_garments=True):
+    """
+    Worker count, per-process cache limits and whether garments go into
+    shared memory so the run's estimated footprint fits budget_bytes: every
+    process's PROCESS_BASE_BYTES and caches (a quarter of the budget split
+    between them), the shared garments once and the rows being rendered.
+    Workers are sized for the median row; in_flight_bytes is what
+    budgeted_map may hand out on top, so larger rows do not run together
+    past the budget. Returns a dict for stats["memory"].
+    """
+    garments = {}
+    footprints = [0]
+    for job in jobs:
+        garment_size, logo_size = job_sizes(job)
+        garments[job["garment_path"]] = garment_footprint(*garment_size, apply_light_map)
+        footprints.append(job_footprint(garment_size, logo_size, apply_light_map))
+    largest_garment = max(garments.values(), default=0)
+    all_garments = sum(garments.values())
+    typical_job = int(np.median(footprints[1:] or footprints))
+
+    for count in range(max(1, workers), 0, -1):
+        # Shared garments are decoded once, but all of them at the same time
+        share = share_garments and count > 1 and all_garments <= budget_bytes // 2
+        cache_bytes = budget_bytes // 4 // count
+        garment_cache = max(largest_garment, cache_bytes // 2)
+        graphic_cache = cache_bytes // 4
+        caches = (0 if share else garment_cache) + 2 * graphic_cache
+        processes = count + 1 if count > 1 else 1  # The parent only writes the ZIP when there is a pool
+        resident = processes * (PROCESS_BASE_BYTES + caches) + (all_garments if share else 0)
+        if count == 1 or resident + count * typical_job <= budget_bytes:
+            break
+
+    return {
+        "budget_mb": rss_mb(budget_bytes),
+        "workers": count,
+        "share_garments": share,
+        "cache_limits": (garment_cache, graphic_cache, graphic_cache),
+        "resident_mb": rss_mb(resident),
+        "in_flight_bytes": max(budget_bytes - resident, max(footprints)),
+        "largest_job_mb": rss_mb(max(footprints)),
+        "fits": resident + max(footprints) <= budget_bytes,
+    }
+
+# Load a decoded garment, using the shared-memory copy when running in a pool worker
+def load_garment(path):
+    shared = shared_garment(path)
+    if shared is not None:
+        return shared
+    return GARMENT_CACHE.load(path)
+
+# Render a single job to JPEG bytes; runs in the main process or in a pool worker
+def render_job(job, apply_light_map, wrap_intensity, timer=None):
+    """
+    Composite one graphic onto one garment and return the encoded JPG bytes.
+    Stage times and byte counts go into timer (a RowTimer) if one is passed.
+    """
+    timer = timer if timer is not None else RowTimer()
+
+    # Decoded garment and trimmed design (bytes are only counted when they had to be decoded)
+    misses = GARMENT_CACHE.misses, GRAPHIC_CACHE.sources.misses
+    with timer.stage("decode"):
+        garment = load_garment(job["garment_path"])
+        source = GRAPHIC_CACHE.source(job["graphic_path"])
+    timer.count("decode", (garment.nbytes if GARMENT_CACHE.misses != misses[0] else 0)
+                + (source.nbytes if GRAPHIC_CACHE.sources.misses != misses[1] else 0))
+
+    # Resize the logo to its print width (keeping its aspect ratio), reusing earlier rows' resizes
+    misses = GRAPHIC_CACHE.misses
+    with timer.stage("resize"):
+        graphic = GRAPHIC_CACHE.load(job["graphic_path"], logo_width(job), Image.Resampling.LANCZOS)
+    timer.count("resize", graphic.nbytes if GRAPHIC_CACHE.misses != misses else 0)
+    position = logo_position(job, garment.width, garment.height, graphic.height)
+
+    # Overlay the graphic and flatten the masked result onto white in one pass
+    result_img = render_flat(garment, graphic, position, apply_light_map=apply_light_map,
+                             wrap_intensity=wrap_intensity, timer=timer)
+
+    with timer.stage("encode"):
+        jpg_buffer = io.BytesIO()
+        Image.fromarray(result_img).save(jpg_buffer, "JPEG", quality=95)
+        jpg_bytes = jpg_buffer.getvalue()
+    timer.count("encode", len(jpg_bytes))
+    return jpg_bytes
+
+# render_job for process_csv: the JPG bytes, the row's RowTimer (picklable for pool workers)
+# and the rendering process's peak RSS so far
+def render_job_timed(job, apply_light_map, wrap_intensity):
+    timer = RowTimer()
+    return render_job(job, apply_light_map, wrap_intensity, timer), timer, peak_rss_bytes()
+
+# Build the missing assets report that goes into every ZIP
+def missing_assets_csv(missing_garments, missing_graphics):
+    missing_df = pd.DataFrame({
+        "Missing Garments": pd.Series(missing_garments).drop_duplicates().reset_index(drop=True),
+        "Missing Graphics": pd.Series(missing_graphics).drop_duplicates().reset_index(drop=True)
+    })
+    return missing_df.to_csv(index=False)
+
+# Function to process the CSV file
+def process_csv(csv_file, apply_light_map, wrap_intensity, graphics_folder=GRAPHICS_FOLDER,
+                garments_folder=GARMENTS_FOLDER, output_folder=OUTPUT_FOLDER, zip_target=None, stats=None,
+                workers=1, save_alpha_masks=False, schedule=True, save_jpgs=False, max_volume_bytes=None,
+                journal=False, render_cache=None, compositor="auto", asset_store=None, memory_budget=None):
+    """
+    Process the CSV file to overlay logos on garments based on the provided data.
+    Also generates a CSV of missing assets and includes it in the ZIP.
+    csv_file may also be a Parquet or Arrow sheet; it is read in chunks
+    (see job_sheet.read_sheet_chunks) and only the render jobs are kept, as
+    compact RenderJob records. Memory is still O(rows): the schedule and the
+    ZIP order need every job before the first one renders.
+    Design / Garment values are matched case-insensitively against one scan of
+    each folder and its subfolders (see asset_index.AssetIndex).
+
+    zip_target can be a file path or a writable file object; by default the ZIP
+    is built in memory and returned as a BytesIO. With a path, each JPG is written
+    into the ZIP on disk as it is rendered (STORED, ZIP64 allowed) and
+    max_volume_bytes splits the archive into self-contained volumes. Loose JPGs
+    are only written to output_folder if save_jpgs is set. If a stats dict is
+    passed it is filled with row counts and the ZIP volumes for the run. workers > 1 renders rows in a process
+    pool (0 or None uses every core); ZIP order is the same as the serial run.
+    Garment alpha masks are only written to output_folder if save_alpha_masks is
+    set: one per garment with any row, whether the row was rendered, taken
+    from the render cache or reused from the journal.
+
+    With schedule set, rows are rendered grouped by garment and then by
+    (design, width) to keep the asset caches warm. ZIP entries then follow the
+    render order; file names, contents and the missing-assets report are
+    unchanged, and for duplicate style numbers the last sheet row still wins
+    (in Output/ and as the last ZIP entry of that name).
+
+    With journal set (zip_target must be a path) every finished row is
+    checkpointed next to the ZIP; re-running the same sheet reuses rows whose
+    inputs are unchanged instead of rendering them again (see rebuild_from_journal).
+    render_cache (a RenderCache) reuses encoded JPGs from any earlier run whose
+    assets, logo size/position and light map settings match.
+
+    compositor picks the compositing backend ("numpy", "opencv", "pillow");
+    "auto" times them once per process and uses the fastest. Pool workers use
+    the same backend as this process.
+
+    asset_store (an AssetStore) is brought up to date for the rows' garments
+    and designs before rendering; they are then memory-mapped from it (also by
+    pool workers) instead of decoded from PNG.
+
+    Every row's decode / resize / blend / mask / encode / zip times and bytes
+    are collected in a RenderProfile; its report (totals, p50/p95 per stage,
+    slowest rows) goes into stats["profile"] and, with a path zip_target, is
+    written next to the ZIP as <name>.profile.json.
+
+    memory_budget (bytes) fits the run into that much memory from the assets'
+    dimensions (see plan_memory): fewer workers, bounded asset caches and a
+    cap on the estimated bytes of rows in flight. stats["memory"] reports the
+    plan and the run's peak RSS (parent and pool workers) either way.
+    """
+    # Resolve the compositing backend before any render keys are computed
+    backend = select_backend(compositor)
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    alpha_masks = {}
+
+    # Track missing assets
+    missing_graphics = []
+    missing_garments = []
+
+    # One directory walk per folder; rows are resolved against the indexes
+    graphic_index = AssetIndex(graphics_folder)
+    garment_index = AssetIndex(garments_folder)
+
+    # Stream the sheet in chunks; only the compact job records are kept
+    sheet_rows = 0
+    jobs = []
+    for chunk in read_sheet_chunks(csv_file):
+        sheet_rows += len(chunk)
+        for job in chunk_jobs(chunk, graphic_index, garment_index, missing_graphics, missing_garments):
+            # One alpha mask per garment that has any row
+            if job["garment_path"] not in alpha_masks:
+                garment_name = os.path.splitext(os.path.basename(job["garment_path"]))[0]
+                alpha_masks[job["garment_path"]] = os.path.join(output_folder, f"{garment_name}_alpha.png")
+            jobs.append(job)
+
+    if schedule:
+        scheduled_jobs = schedule_jobs(jobs)
+        reuse = reuse_report(jobs, scheduled_jobs, garment_entries=GARMENT_CACHE.max_entries)
+        jobs = scheduled_jobs
+
+    # Rows already finished by an earlier (possibly crashed) run of this sheet
+    run_journal = None
+    reused_jobs = []
+    if journal:
+        settings = {"apply_light_map": bool(apply_light_map), "wrap_intensity": wrap_intensity, "jpeg_quality": 95,
+                    "renderer": RENDERER_VERSION, "compositor": backend.pixels}
+        run_journal = RunJournal.for_zip(zip_target)
+        run_journal.start_run(len(jobs), settings)
+        run_journal.record_missing(missing_garments, missing_graphics)
+        for job in jobs:
+            job["input_hash"] = job_hash(job, settings)
+        reused_jobs = [job for job in jobs if run_journal.completed(job["input_hash"])]
+        jobs_to_render = [job for job in jobs if not run_journal.completed(job["input_hash"])]
+    else:
+        jobs_to_render = jobs
+
+    use_asset_store(asset_store)
+    if asset_store is not None:
+        store_counts = asset_store.build(
+            garments={job["garment_path"] for job in jobs_to_render},
+            graphics={job["graphic_path"] for job in jobs_to_render},
+            light_planes=apply_light_map,
+        )
+
+    workers = workers or os.cpu_count() or 1
+    memory_plan = None
+    if memory_budget is not None:
+        memory_plan = plan_memory(jobs_to_render, memory_budget, workers, apply_light_map, share_garments=asset_store is None)
+        workers = memory_plan["workers"]
+    cache_limits = memory_plan["cache_limits"] if memory_plan is not None else CACHE_LIMITS
+    set_cache_limits(cache_limits)
+    reset_peak_rss()
+    worker_peak = None
+
+    render = functools.partial(render_job_timed, apply_light_map=apply_light_map, wrap_intensity=wrap_intensity)
+    profile = RenderProfile()
+
+    if zip_target is None:
+        zip_target = io.BytesIO()
+
+    with StreamingZipWriter(zip_target, max_volume_bytes=max_volume_bytes) as zip_file:
+        # Duplicate style numbers: the last sheet row must stay the one in Output/
+        # and the last ZIP entry with that name, whatever order rows render in.
+        # Only names shared by several rows are tracked: [rows still to write, last sheet row]
+        name_counts = collections.Counter(job["style_number"] for job in jobs)
+        duplicates = {}
+        for job in jobs:
+            if name_counts[job["style_number"]] > 1:
+                duplicate = duplicates.setdefault(job["style_number"], [0, job["row_index"]])
+                duplicate[0] += 1
+                duplicate[1] = max(duplicate[1], job["row_index"])
+        del name_counts
+        deferred = {}
+
+        # source: "render", "render_cache" or "journal" (where the JPG came from, for the profile)
+        def write_result(job, jpg_bytes, timer=None, source="render"):
+            timer = timer if timer is not None else RowTimer()
+            style_number = job["style_number"]
+            profile.add(job["row_index"], f"{style_number}.jpg", timer, source)
+            if render_cache is not None and "render_key" in job:
+                render_cache.put(job["render_key"], jpg_bytes)
+            if run_journal is not None:
+                run_journal.record_done(job, job["input_hash"], None if source == "journal" else jpg_bytes)
+            duplicate = duplicates.get(style_number)
+            remaining = 0
+            if duplicate is not None:
+                duplicate[0] -= 1
+                remaining = duplicate[0]
+            if duplicate is None or job["row_index"] == duplicate[1]:
+                if save_jpgs:
+                    # Save the result image with the style number as the filename (JPG with white background)
+                    output_jpg_path = os.path.join(output_folder, f"{style_number}.jpg")
+                    with open(output_jpg_path, "wb") as img_file:
+                        img_file.write(jpg_bytes)
+                if remaining:
+                    deferred[style_number] = jpg_bytes  # Earlier duplicates still to come
+                    return
+            written = zip_file.bytes_written
+            with timer.stage("zip"):
+                zip_file.write(f"{style_number}.jpg", jpg_bytes)
+                if not remaining and style_number in deferred:
+                    zip_file.write(f"{style_number}.jpg", deferred.pop(style_number))
+            timer.count("zip", zip_file.bytes_written - written)
+
+        for job in reused_jobs:
+            write_result(job, run_journal.read_part(job["input_hash"]), source="journal")
+
+        # Rows rendered byte-identically by any earlier run come from the render cache
+        if render_cache is not None:
+            cache_misses = []
+            for job in jobs_to_render:
+                job["render_key"] = render_key(job, apply_light_map, wrap_intensity)
+                jpg_bytes = render_cache.get(job["render_key"])
+                if jpg_bytes is None:
+                    cache_misses.append(job)
+                else:
+                    write_result(job, jpg_bytes, source="render_cache")
+            jobs_to_render = cache_misses
+
+        if workers > 1 and len(jobs_to_render) > 1:
+            chunksize = max(1, len(jobs_to_render) // (workers * 8))
+            # Decode each garment once in this process; workers attach shared views
+            # (or map the asset store's planes themselves)
+            share_garments = asset_store is None and (memory_plan is None or memory_plan["share_garments"])
+            with SharedGarmentStore() as garment_store:
+                for garment_path in alpha_masks if share_garments else ():
+                    garment = GARMENT_CACHE.load(garment_path)
+                    if apply_light_map:
+                        garment.ensure_light_planes()
+                    garment_store.add(garment_path, garment)
+                store_dir = asset_store.store_dir if asset_store is not None else None
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                         initargs=(garment_store.descriptor(), backend.name, store_dir, cache_limits)) as pool:
+                    # Both yield in submission order, so the ZIP matches a serial run
+                    if memory_plan is None:
+                        results = pool.map(render, jobs_to_render, chunksize=chunksize)
+                    else:
+                        job_bytes = lambda job: job_footprint(*job_sizes(job), apply_light_map)
+                        results = budgeted_map(pool, render, jobs_to_render, job_bytes,
+                                               memory_plan["in_flight_bytes"], workers * 2)
+                    worker_peak = 0
+                    for job, (jpg_bytes, timer, rss) in zip(jobs_to_render, results):
+                        worker_peak = max(worker_peak, rss or 0)
+                        write_result(job, jpg_bytes, timer)
+        else:
+            for job in jobs_to_render:
+                jpg_bytes, timer, _ = render(job)
+                write_result(job, jpg_bytes, timer)
+
+        # Alpha masks are written here rather than by the rows, so rows served from
+        # the render cache or the journal still get their garment's mask
+        if save_alpha_masks:
+            for garment_path, alpha_mask_path in alpha_masks.items():
+                save_alpha_mask(GARMENT_CACHE.load(garment_path).image(), alpha_mask_path)
+
+        # After processing, add missing assets CSV to the ZIP
+        zip_file.write("missing_assets.csv", missing_assets_csv(missing_garments, missing_graphics))
+
+    if run_journal is not None:
+        run_journal.close()
+    peak_rss = peak_rss_bytes()
+
+    # Stage timings next to the ZIP (<name>.profile.json) when it is written to a path
+    if isinstance(zip_target, (str, os.PathLike)):
+        profile_report = profile.write(profile_path(zip_target))
+    else:
+        profile_report = profile.report()
+
+    if stats is not None:
+        stats["rows"] = sheet_rows
+        stats["rendered"] = len(jobs)
+        stats["skipped"] = sheet_rows - len(jobs)
+        stats["workers"] = workers
+        stats["resumed"] = len(reused_jobs)
+        if render_cache is not None:
+            stats["render_cache"] = render_cache.stats()
+        if asset_store is not None:
+            stats["asset_store"] = store_counts
+        stats["zip_volumes"] = zip_file.volumes
+        stats["zip_bytes"] = zip_file.bytes_written
+        stats["garment_cache"] = GARMENT_CACHE.stats()
+        stats["graphic_cache"] = GRAPHIC_CACHE.stats()
+        stats["compositor"] = {"backend": backend.name, "calibration": calibration_timings()}
+        stats["profile"] = profile_report
+        stats["memory"] = dict(memory_plan or {}, peak_rss_mb=rss_mb(peak_rss), worker_peak_rss_mb=rss_mb(worker_peak))
+        if schedule:
+            stats["schedule"] = reuse
+
+    if hasattr(zip_target, "seek"):
+        zip_target.seek(0)
+    return zip_target
+
+#light blend logic on the logo
+def apply_fabric_wrap_blend(logo_img, apparel_img, alpha, position, intensity=0.4, size=None, offset=(0, 0)):
+    # Crop fabric region where logo will go (the full logo rectangle if logo_img is trimmed)
+    x, y = position
+    w, h = size if size is not None else (logo_img.shape[1], logo_img.shape[0])
+    # Adjust position to top-left for cropping (position is center)
+    x_tl = int(x - w / 2)
+    y_tl = int(y - h / 2)
+    # Ensure we don't go out of bounds
+    x_tl = max(0, min(apparel_img.shape[1] - w, x_tl))
+    y_tl = max(0, min(apparel_img.shape[0] - h, y_tl))
+
+    fabric_crop = apparel_img[y_tl:y_tl + h, x_tl:x_tl + w]
+
+    # Convert fabric to grayscale (light map)
+    light_map = cv2.cvtColor(fabric_crop, cv2.COLOR_BGR2GRAY)
+
+    # Normalize the light map so the darkest pixel is 0 and the lightest is 1
+    min_val, max_val = np.min(light_map), np.max(light_map)
+    if max_val > min_val:  # Avoid division by zero
+        light_map = (light_map - min_val) / (max_val - min_val)
+    else:
+        light_map = np.ones_like(light_map)  # If all pixels are the same, use a uniform map
+
+    # Apply Gaussian blur to smooth the light map
+    light_map = cv2.GaussianBlur(light_map, (21, 21), 0)
+
+    # Only the trimmed part of the logo is lit
+    off_x, off_y = offset
+    light_map = light_map[off_y:off_y + logo_img.shape[0], off_x:off_x + logo_img.shape[1]]
+    return blend_light_map(logo_img, light_map, intensity)
+
+#light blend from a garment's precomputed planes (see DecodedGarment.ensure_light_planes)
+def apply_light_planes(logo_img, gray, light, top_left, intensity=0.4, size=None, offset=(0, 0)):
+    """
+    Same wrap as apply_fabric_wrap_blend, but the grayscale and blurred planes
+    come from the whole garment, so a row only crops and normalizes them.
+    Within the 21x21 blur radius of the logo's edge the blur sees the real
+    fabric instead of a mirrored crop; everywhere else the result is the same.
+    For a trimmed logo, size is the full logo rectangle at top_left and offset
+    is where logo_img sits inside it.
+    """
+    x_tl, y_tl = top_left
+    full_w, full_h = size if size is not None else (logo_img.shape[1], logo_img.shape[0])
+
+    # Normalize with the crop's own darkest/lightest pixel, as the per-row version does
+    min_val, max_val = cv2.minMaxLoc(gray[y_tl:y_tl + full_h, x_tl:x_tl + full_w])[:2]
+    h, w = logo_img.shape[:2]
+    x_tl += offset[0]
+    y_tl += offset[1]
+    if max_val > min_val:  # Avoid division by zero
+        light_map = (light[y_tl:y_tl + h, x_tl:x_tl + w] - np.float32(min_val)) / np.float32(max_val - min_val)
+    else:
+        light_map = np.ones((h, w), dtype=np.float32)  # If all pixels are the same, use a uniform map
+
+    return blend_light_map(logo_img, light_map, intensity)
+
+#main function to combine the image and logo
+def overlay_logo(apparel_img, logo_img, position, apply_light_map=False, wrap_intensity=15):
+    """
+    Overlay the resized logo on the garment image at the specified position.
+    """
+    apparel_bgr = np.array(apparel_img.convert("RGB"))[:, :, ::-1]  # Convert to BGR
+    graphic = ResizedGraphic.from_image(logo_img)  # Pre-multiplied BGR + alpha
+    return composite_logo(apparel_bgr, graphic, position, apply_light_map=apply_light_map, wrap_intensity=wrap_intensity)
+
+# Blend a prepared ResizedGraphic into a copy of the garment's BGR pixels
+def composite_logo(apparel_bgr, graphic, position, apply_light_map=False, wrap_intensity=15, light_planes=None):
+    """
+    Array version of overlay_logo: apparel_bgr is left untouched, the result is RGB.
+    light_planes can pass the garment's precomputed (gray, light) planes so the
+    light map wrap skips its per-row grayscale conversion and blur.
+    """
+    apparel = apparel_bgr.copy()  # Blend into a copy so cached garments stay untouched
+    blend_logo(apparel, apparel_bgr, graphic, position, apply_light_map, wrap_intensity, light_planes)
+    return cv2.cvtColor(apparel, cv2.COLOR_BGR2RGB)
+
+# Blend a prepared ResizedGraphic into a BGR frame in place
+def blend_logo(apparel, apparel_bgr, graphic, position, apply_light_map=False, wrap_intensity=15, light_planes=None):
+    """
+    apparel is the frame written to; apparel_bgr holds the untouched garment
+    pixels the per-row light map is taken from (it may be the same array).
+    The logo is placed by its full size; only its trimmed planes are blended.
+    """
+    alpha = graphic.alpha
+    logo_rgb = graphic.premult_bgr
+    logo_h, logo_w = graphic.height, graphic.width
+    off_x, off_y = graphic.offset
+    trim_h, trim_w = alpha.shape
+
+    # Get center position coordinates
+    center_x, center_y = position
+
+    # Calculate top-left position from center
+    x = int(center_x - logo_w / 2)
+    y = int(center_y - logo_h / 2)
+
+    # Ensure position is within bounds
+    x = max(0, min(apparel.shape[1] - logo_w, x))
+    y = max(0, min(apparel.shape[0] - logo_h, y))
+
+    # Apply light map wrap if selected
+    if apply_light_map and light_planes is not None:
+        logo_rgb = apply_light_planes(logo_rgb, *light_planes, (x, y), intensity=wrap_intensity / 100.0,
+                                      size=graphic.size, offset=graphic.offset)
+    elif apply_light_map:
+        # Pass both apparel and logo to the blending as BGR images with center position
+        logo_rgb = apply_fabric_wrap_blend(logo_rgb, apparel_bgr, alpha, (center_x, center_y), intensity=wrap_intensity / 100.0,
+                                           size=graphic.size, offset=graphic.offset)
+
+    # Blend the logo into the apparel image in place, skipping its transparent tiles
+    x += off_x
+    y += off_y
+    active_backend().composite(apparel[y:y + trim_h, x:x + trim_w], logo_rgb, alpha, graphic.regions)
+    return apparel
+
+# Fused render path: decoded garment + graphic -> flattened RGB frame for the JPEG encoder
+def render_flat(garment, graphic, position, apply_light_map=False, wrap_intensity=15, timer=None):
+    """
+    Same pixels as composite_logo followed by putalpha(garment mask) and an
+    alpha_composite onto white, with one full-frame copy instead of about five:
+    the logo, the white flatten and the BGR -> RGB swap all work in place.
+    Blend and mask times go into timer (a RowTimer) if one is passed.
+    """
+    timer = timer if timer is not None else RowTimer()
+    with timer.stage("blend"):
+        frame = garment.bgr.copy()
+
+        # Light planes are computed once per garment
+        light_planes = None
+        if apply_light_map:
+            garment.ensure_light_planes()
+            light_planes = (garment.gray, garment.light)
+        blend_logo(frame, garment.bgr, graphic, position, apply_light_map, wrap_intensity, light_planes)
+    timer.count("blend", graphic.premult_bgr.nbytes)
+
+    # Apply the garment's alpha mask by flattening onto white (only its edge tiles are computed)
+    with timer.stage("mask"):
+        flatten_onto_white(frame, garment.alpha, garment.alpha_regions)
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+    timer.count("mask", frame.nbytes)
+    return frame
+
+# Check a job sheet without rendering or decoding anything
+def dry_run(csv_file, graphics_folder=GRAPHICS_FOLDER, garments_folder=GARMENTS_FOLDER):
+    """
+    Validation report for a sheet (see job_sheet.validate_sheet): missing
+    assets, bad widths and coordinates, unnamed rows and overwritten output names.
+    """
+    return validate_sheet(read_sheet(csv_file), graphics_folder, garments_folder)
+
+# Rebuild a journaled run's ZIP from its checkpoints without rendering anything
+def rebuild_from_journal(zip_path, max_volume_bytes=None):
+    """
+    Write the ZIP for the latest journaled run of zip_path: finished rows in sheet
+    order plus missing_assets.csv. Returns a stats dict; "complete" is False if
+    that run had not finished every row.
+    """
+    journal_path, parts_dir = journal_paths(zip_path)
+    run, done, missing = latest_run(journal_path)
+
+    with StreamingZipWriter(zip_path, max_volume_bytes=max_volume_bytes) as zip_file:
+        for row in sorted(done):
+            with open(os.path.join(parts_dir, done[row]["part"]), "rb") as part_file:
+                zip_file.write(done[row]["name"], part_file.read())
+        zip_file.write("missing_assets.csv", missing_assets_csv(missing["garments"], missing["graphics"]))
+
+    return {
+        "rendered": len(done),
+        "jobs": run["jobs"],
+        "complete": len(done) == run["jobs"],
+        "zip_volumes": zip_file.volumes,
+    }
+
+# Render a job sheet straight to <output_dir>/<sheet name>.zip without the UI
+def run_job_sheet(csv_path, graphics_folder=GRAPHICS_FOLDER, garments_folder=GARMENTS_FOLDER,
+                  output_dir=OUTPUT_FOLDER, apply_light_map=False, wrap_intensity=0, workers=1,
+                  save_alpha_masks=False, schedule=True, save_jpgs=False, max_volume_bytes=None,
+                  journal=False, render_cache=None, compositor="auto", asset_store=None, memory_budget=None):
+    """
+    Headless entry point for cron / benchmarking. Returns a stats dict with the
+    ZIP path (and any extra volumes), row counts, elapsed seconds and rows per second.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    zip_path = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(csv_path))[0]}.zip")
+
+    stats = {}
+    start = time.perf_counter()
+    process_csv(
+        csv_path, apply_light_map, wrap_intensity,
+        graphics_folder=graphics_folder, garments_folder=garments_folder,
+        output_folder=output_dir, zip_target=zip_path, stats=stats, workers=workers,
+        save_alpha_masks=save_alpha_masks, schedule=schedule, save_jpgs=save_jpgs,
+        max_volume_bytes=max_volume_bytes, journal=journal, render_cache=render_cache,
+        compositor=compositor, asset_store=asset_store, memory_budget=memory_budget
+    )
+    elapsed = time.perf_counter() - start
+
+    stats["zip_path"] = zip_path
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_second"] = round(stats["rows"] / elapsed, 2) if elapsed > 0 else 0.0
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a job sheet CSV into a ZIP of garment mockups.")
+    parser.add_argument("csv_path", help="Job sheet CSV, Parquet or Arrow file (Design, Garment, Style Number, MPN, Width, x/y coordinate)")
+    parser.add_argument("--graphics", default=GRAPHICS_FOLDER, help="Folder of design PNGs")
+    parser.add_argument("--garments", default=GARMENTS_FOLDER, help="Folder of garment PNGs")
+    parser.add_argument("--output-dir", default=OUTPUT_FOLDER, help="Where the ZIP (and optional JPGs/masks) are written")
+    parser.add_argument("--light-map", action="store_true", help="Apply light map wrapping (simulate fabric texture)")
+    parser.add_argument("--intensity", type=int, default=10, help="Light map intensity (0-30, only used with --light-map)")
+    parser.add_argument("--workers", type=int, default=1, help="Render processes (0 = one per CPU core)")
+    parser.add_argument("--save-alpha-masks", action="store_true", help="Also write <garment>_alpha.png masks to the output dir")
+    parser.add_argument("--no-schedule", action="store_true", help="Render rows in sheet order instead of grouping by garment/design")
+    parser.add_argument("--save-jpgs", action="store_true", help="Also write each JPG loose into the output dir")
+    parser.add_argument("--max-volume-mb", type=float, default=None, help="Split the ZIP into volumes of at most this many MB")
+    parser.add_argument("--resume", action="store_true", help="Checkpoint every row and skip rows finished by an earlier run")
+    parser.add_argument("--rebuild", action="store_true", help="Only rebuild the ZIP from the last --resume run's checkpoints")
+    parser.add_argument("--dry-run", action="store_true", help="Only validate the sheet and write <sheet>_preflight.csv to the output dir")
+    parser.add_argument("--render-cache", nargs="?", const=RENDER_CACHE_FOLDER, default=None,
+                        help=f"Reuse renders from earlier runs (cache folder, default {RENDER_CACHE_FOLDER})")
+    parser.add_argument("--render-cache-mb", type=float, default=2048, help="Render cache size limit in MB")
+    parser.add_argument("--compositor", choices=["auto"] + sorted(BACKENDS), default="auto",
+                        help="Compositing backend (auto = time each one at startup and use the fastest)")
+    parser.add_argument("--asset-store", nargs="?", const=ASSET_STORE_FOLDER, default=None,
+                        help=f"Memory-map pre-decoded assets, converting new or changed PNGs first (store folder, default {ASSET_STORE_FOLDER})")
+    parser.add_argument("--asset-store-mb", type=float, default=4096, help="Asset store size limit in MB")
+    parser.add_argument("--memory-budget-mb", type=float, default=None,
+                        help="Fit the run into this much memory (fewer workers, smaller caches, fewer rows in flight)")
+    args = parser.parse_args(argv)
+    max_volume_bytes = int(args.max_volume_mb * 1024 * 1024) if args.max_volume_mb else None
+
+    if args.dry_run:
+        report = dry_run(args.csv_path, graphics_folder=args.graphics, garments_folder=args.garments)
+        os.makedirs(args.output_dir, exist_ok=True)
+        report_path = os.path.join(args.output_dir, f"{os.path.splitext(os.path.basename(args.csv_path))[0]}_preflight.csv")
+        report["issues"].to_csv(report_path, index=False)
+        print(f"{report['renderable']} of {report['rows']} rows would render")
+        for problem, count in report["counts"].items():
+            print(f"{problem}: {count}")
+        print(f"Wrote {report_path}")
+        return
+
+    if args.rebuild:
+        zip_path = os.path.join(args.output_dir, f"{os.path.splitext(os.path.basename(args.csv_path))[0]}.zip")
+        stats = rebuild_from_journal(zip_path, max_volume_bytes=max_volume_bytes)
+        for volume in stats["zip_volumes"]:
+            print(f"Wrote {volume}")
+        print(f"{stats['rendered']} of {stats['jobs']} rows from the journal"
+              + ("" if stats["complete"] else " (run did not finish; re-run with --resume)"))
+        return
+
+    stats = run_job_sheet(
+        args.csv_path, graphics_folder=args.graphics, garments_folder=args.garments, output_dir=args.output_dir,
+        apply_light_map=args.light_map, wrap_intensity=args.intensity if args.light_map else 0,
+        workers=args.workers, save_alpha_masks=args.save_alpha_masks, schedule=not args.no_schedule,
+        save_jpgs=args.save_jpgs, max_volume_bytes=max_volume_bytes, journal=args.resume,
+        render_cache=RenderCache(args.render_cache, int(args.render_cache_mb * 1024 * 1024)) if args.render_cache else None,
+        compositor=args.compositor, asset_store=AssetStore(args.asset_store, int(args.asset_store_mb * 1024 * 1024)) if args.asset_store else None,
+        memory_budget=int(args.memory_budget_mb * 1024 * 1024) if args.memory_budget_mb else None
+    )
+    for volume in stats["zip_volumes"]:
+        print(f"Wrote {volume}")
+    print(f"{stats['rendered']} rendered, {stats['skipped']} skipped, {stats['rows']} rows "
+          f"in {stats['seconds']}s ({stats['rows_per_second']} rows/s, {stats['workers']} workers)")
+    print(f"compositing backend: {stats['compositor']['backend']}")
+    memory = stats["memory"]
+    print(f"peak RSS: {memory['peak_rss_mb']} MB" + (f", workers {memory['worker_peak_rss_mb']} MB" if memory["worker_peak_rss_mb"] else "")
+          + (f" (budget {memory['budget_mb']} MB, {memory['workers']} workers)" if "budget_mb" in memory else ""))
+    if "fits" in memory and not memory["fits"]:
+        print(f"warning: budget is below the estimated {memory['resident_mb']} MB resident plus "
+              f"{memory['largest_job_mb']} MB for the largest row")
+    if "asset_store" in stats:
+        store_counts = stats["asset_store"]
+        print(f"asset store: {store_counts['built']} converted, {store_counts['current']} up to date, {store_counts['evicted']} evicted")
+    if stats["resumed"]:
+        print(f"{stats['resumed']} rows reused from the checkpoint journal")
+    if "render_cache" in stats:
+        cache_stats = stats["render_cache"]
+        print(f"render cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['bytes'] / 1024 / 1024:.1f} MB")
+    if "schedule" in stats:
+        for cache_name, rates in stats["schedule"].items():
+            print(f"{cache_name}: {rates['csv_order']:.1%} in sheet order, {rates['scheduled']:.1%} scheduled")
+    for stage, totals in stats["profile"]["stages"].items():
+        print(f"{stage}: {totals['seconds']:.2f}s, {totals['bytes'] / 1024 / 1024:.1f} MB "
+              f"(p50 {totals['p50_ms']:.1f} ms, p95 {totals['p95_ms']:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
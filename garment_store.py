@@ -0,0 +1,107 @@
+import numpy as np
+import sys
+from multiprocessing import shared_memory
+
+from asset_cache import DecodedGarment
+
+#Shared-memory store for decoded garments used by the csv_pipeline process pool.
+#The parent decodes every garment once; pool workers attach zero-copy NumPy views.
+
+# Garments attached in this process, keyed by garment path
+_attached = {}
+# SharedMemory handles backing the views (must stay referenced while the views are used)
+_attached_blocks = []
+
+class SharedGarmentStore:
+    """
+    Decode each garment PNG once into multiprocessing.shared_memory.
+
+    Use as a context manager in the parent process and pass descriptor() to
+    attach_garments() in each worker (e.g. as a pool initializer). Every plane
+    of the DecodedGarment (RGBA, BGR, alpha) gets its own block. Blocks are
+    unlinked when the store is closed. Light map planes are shared too if the
+    garment already has them.
+    """
+    def __init__(self):
+        self._blocks = []
+        self._index = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __contains__(self, path):
+        return path in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def nbytes(self):
+        return sum(shm.size for shm in self._blocks)
+
+    def add(self, path, garment=None):
+        """
+        Copy a garment into shared memory. The PNG is decoded unless an already
+        decoded DecodedGarment is passed in.
+        """
+        if path in self._index:
+            return
+        if garment is None:
+            garment = DecodedGarment.from_file(path)
+
+        planes = {}
+        for plane_name, array in garment.planes().items():
+            shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+            view[...] = array
+            self._blocks.append(shm)
+            planes[plane_name] = (shm.name, array.shape, array.dtype.str)
+        self._index[path] = planes
+
+    def descriptor(self):
+        """
+        Picklable {path: {plane: (block name, shape, dtype)}} mapping for attach_garments().
+        """
+        return dict(self._index)
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks.clear()
+        self._index.clear()
+
+# Open a block created by the parent process. Pool workers share the parent's
+# resource tracker, so attaching never causes a second unlink
+def _open_block(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+def attach_garments(descriptor):
+    """
+    Attach read-only DecodedGarment views for every garment in a
+    SharedGarmentStore descriptor. Safe to use as a ProcessPoolExecutor initializer.
+    """
+    for path, planes in descriptor.items():
+        if path in _attached:
+            continue
+        views = {}
+        for plane_name, (name, shape, dtype) in planes.items():
+            shm = _open_block(name)
+            _attached_blocks.append(shm)
+            views[plane_name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        _attached[path] = DecodedGarment(**views)
+    return _attached
+
+def shared_garment(path):
+    """
+    Return the attached DecodedGarment for a garment path, or None if it is not shared.
+    """
+    return _attached.get(path)
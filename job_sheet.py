@@ -0,0 +1,279 @@
+import os
+import numpy as np
+import pandas as pd
+
+from asset_index import AssetIndex
+
+#Column-wise (vectorized) handling of job sheets for csv_pipeline.py: chunked reading
+#of CSV / Parquet / Arrow sheets, normalization into render jobs and a dry-run
+#validation report.
+
+# Columns every sheet needs; MPN (the fallback output name) and x / y coordinate are optional
+REQUIRED_COLUMNS = ("Design", "Garment", "Style Number", "Width")
+# Matched case-insensitively, so lowercased before anything else
+LOWERCASE_COLUMNS = ("Design", "Garment", "Style Number", "MPN")
+
+# Sheet rows held in memory at a time while reading
+CHUNK_ROWS = 50_000
+
+def _sheet_format(source):
+    name = os.fspath(source) if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+    ext = os.path.splitext(str(name))[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".arrow", ".feather", ".ipc"):
+        return "arrow"
+    return "csv"
+
+def _text_columns(chunk):
+    # Name columns are text whatever the file stored (so "123" never becomes "123.0")
+    for col in LOWERCASE_COLUMNS:
+        if col in chunk.columns and not (chunk[col].dtype == object or pd.api.types.is_string_dtype(chunk[col])):
+            chunk[col] = chunk[col].astype(object).where(chunk[col].isna(), chunk[col].astype(str))
+    return chunk
+
+def read_sheet_chunks(source, chunk_rows=CHUNK_ROWS):
+    """
+    Yield a job sheet as DataFrames of at most chunk_rows rows, numbered by
+    sheet row across chunks. source is a path or file object; .parquet/.pq
+    and .arrow/.feather/.ipc (Arrow IPC file) are read with pyarrow,
+    anything else as CSV. The name columns are always read as text.
+    """
+    sheet_format = _sheet_format(source)
+    if sheet_format == "csv":
+        text = {col: str for col in LOWERCASE_COLUMNS}
+        for chunk in pd.read_csv(source, dtype=text, chunksize=chunk_rows):
+            yield _text_columns(chunk)
+        return
+
+    if sheet_format == "parquet":
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(source).iter_batches(batch_size=chunk_rows)
+    else:
+        import pyarrow.ipc as ipc
+        reader = ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+    start = 0
+    for batch in batches:
+        # Arrow IPC batches keep the writer's size; split big ones to chunk_rows
+        for offset in range(0, batch.num_rows, chunk_rows):
+            chunk = batch.slice(offset, chunk_rows).to_pandas()
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            start += len(chunk)
+            yield _text_columns(chunk)
+
+def read_sheet(source):
+    """
+    The whole sheet as one DataFrame, read the same way as read_sheet_chunks().
+    """
+    return pd.concat(list(read_sheet_chunks(source)))
+
+def lowercase_columns(data):
+    """
+    Lowercase the string cells of LOWERCASE_COLUMNS in place; other cells are left as they are.
+    """
+    for col in LOWERCASE_COLUMNS:
+        if col in data.columns and (data[col].dtype == object or pd.api.types.is_string_dtype(data[col])):
+            lowered = data[col].str.lower()  # NaN for cells that are not strings
+            data[col] = lowered.where(lowered.notna(), data[col])
+    return data
+
+def px_column(values, default=None):
+    """
+    clean_px for a whole column: a trailing 'px' is dropped and the number
+    truncated to an int. Returns (float values with default filled in, mask
+    of cells that were set but not a number, which clean_px silently defaults).
+    """
+    text = values.astype("string").str.strip().str.replace(r"px$", "", regex=True)
+    numbers = pd.to_numeric(text, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    invalid = np.isnan(numbers) | np.isinf(numbers)
+    unparsable = invalid & values.notna().to_numpy()
+    numbers = np.trunc(numbers)
+    numbers[invalid] = np.nan if default is None else default
+    return numbers, unparsable
+
+def style_numbers(data):
+    """
+    Output name (without .jpg) of every row: Style Number if set, otherwise MPN.
+    A sheet without an MPN column is read as having every MPN empty.
+    Returns (names, mask of rows where both are empty).
+    """
+    # str() of an empty cell is "nan", as in build_job
+    style = data["Style Number"].astype(str).fillna("nan").str.strip()
+    has_style = data["Style Number"].notna().to_numpy() & (style != "").to_numpy()
+    mpn_values = data["MPN"] if "MPN" in data.columns else pd.Series(np.nan, index=data.index, dtype=object)
+    mpn = mpn_values.astype(str).fillna("nan").str.strip()
+    has_mpn = mpn_values.notna().to_numpy() & (mpn != "").to_numpy()
+    return pd.Series(np.where(has_style, style, mpn), index=data.index), ~has_style & ~has_mpn
+
+def resolve_column(values, index):
+    """
+    Real path (or None) for every cell, resolving each distinct value once.
+    """
+    distinct = values.drop_duplicates()
+    paths = dict(zip(distinct, (index.resolve(value) for value in distinct)))
+    return values.map(paths)
+
+class RenderJob:
+    """
+    One renderable sheet row. process_csv keeps every job for the schedule,
+    so it is a slotted record rather than a dict; fields are read and set
+    like dict keys (job["width"], "render_key" in job), so code written for
+    plain dict jobs works unchanged. input_hash and render_key are None
+    until process_csv sets them.
+    """
+    __slots__ = ("row_index", "graphic_path", "garment_path", "width", "style_number", "x_coord", "y_coord",
+                 "input_hash", "render_key")
+
+    def __init__(self, row_index, graphic_path, garment_path, width, style_number, x_coord, y_coord):
+        self.row_index = row_index
+        self.graphic_path = graphic_path
+        self.garment_path = garment_path
+        self.width = width
+        self.style_number = style_number
+        self.x_coord = x_coord
+        self.y_coord = y_coord
+        self.input_hash = None
+        self.render_key = None
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def __getstate__(self):
+        return tuple(getattr(self, key) for key in self.__slots__)
+
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+
+def chunk_jobs(chunk, graphic_index, garment_index, missing_graphics, missing_garments):
+    """
+    Normalize one sheet chunk column-wise and yield a picklable RenderJob
+    per row whose design and garment exist. Design / Garment values of the
+    other rows are appended to missing_graphics / missing_garments in sheet order.
+    """
+    chunk = lowercase_columns(chunk)
+    names = style_numbers(chunk)[0].to_numpy()
+    # Coordinates: a trailing 'px' is dropped; missing or bad x centers the logo, bad y uses the default height
+    if "x coordinate" in chunk.columns:
+        x_coords = px_column(chunk["x coordinate"], 500)[0]
+    else:
+        x_coords = np.full(len(chunk), 500.0)
+    if "y coordinate" in chunk.columns:
+        y_coords = px_column(chunk["y coordinate"])[0]
+    else:
+        y_coords = np.full(len(chunk), np.nan)
+
+    designs = chunk["Design"].to_numpy()
+    garments = chunk["Garment"].to_numpy()
+    graphic_paths = resolve_column(chunk["Design"], graphic_index).to_numpy()
+    garment_paths = resolve_column(chunk["Garment"], garment_index).to_numpy()
+    found_graphic = pd.notna(graphic_paths)
+    found_garment = pd.notna(garment_paths)
+    for i in np.flatnonzero(~(found_graphic & found_garment)):
+        if not found_graphic[i]:
+            missing_graphics.append(designs[i])
+        if not found_garment[i]:
+            missing_garments.append(garments[i])
+
+    widths = chunk["Width"].to_numpy()
+    rows = chunk.index.to_numpy()
+    for i in np.flatnonzero(found_graphic & found_garment):
+        yield RenderJob(
+            int(rows[i]), graphic_paths[i], garment_paths[i], widths[i], names[i],
+            int(x_coords[i]), None if np.isnan(y_coords[i]) else int(y_coords[i]),
+        )
+
+def validate_sheet(data, graphics_folder, garments_folder):
+    """
+    Dry-run check of a whole job sheet without decoding any image. data is
+    the DataFrame from read_sheet(). Returns {"rows", "renderable",
+    "counts": {problem: rows}, "issues": DataFrame of row / problem / column /
+    value / detail}. Problems: missing_column, missing_graphic,
+    missing_garment, invalid_width, invalid_x_coordinate, invalid_y_coordinate
+    (set but unparsable, so the default would be used), missing_output_name
+    (no Style Number and no MPN) and duplicate_output_name (an earlier row
+    whose JPG a later row with the same name overwrites).
+    """
+    issues = []
+
+    def report(mask, problem, column, values, detail=""):
+        rows = np.flatnonzero(mask)
+        if len(rows):
+            issues.append(pd.DataFrame({
+                "row": data.index[rows],
+                "problem": problem,
+                "column": column,
+                "value": np.asarray(values, dtype=object)[rows],
+                "detail": detail if isinstance(detail, str) else np.asarray(detail, dtype=object)[rows],
+            }))
+
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in data.columns]
+    if missing_columns:
+        for col in missing_columns:
+            issues.append(pd.DataFrame({"row": [None], "problem": ["missing_column"], "column": [col],
+                                        "value": [None], "detail": ["required column not in sheet"]}))
+        return _report(len(data), 0, issues)
+
+    data = lowercase_columns(data.copy())
+    renderable = np.ones(len(data), dtype=bool)
+
+    # Assets: one folder scan each, one lookup per distinct name
+    for col, folder, problem in (("Design", graphics_folder, "missing_graphic"),
+                                 ("Garment", garments_folder, "missing_garment")):
+        found = resolve_column(data[col], AssetIndex(folder)).notna().to_numpy()
+        report(~found, problem, col, data[col], folder)
+        renderable &= found
+
+    # Width must be a number that gives a logo at least one pixel wide
+    if pd.api.types.is_numeric_dtype(data["Width"]):
+        widths = data["Width"].to_numpy(dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            bad_width = ~(np.isfinite(widths) & (widths / 12 * 370 >= 1))
+    else:
+        bad_width = np.ones(len(data), dtype=bool)
+    report(bad_width, "invalid_width", "Width", data["Width"], "not a positive number of inches")
+    renderable &= ~bad_width
+
+    for col in ("x coordinate", "y coordinate"):
+        if col in data.columns:
+            unparsable = px_column(data[col])[1]
+            default = "500 (centered)" if col == "x coordinate" else "None (centered - 40)"
+            report(unparsable, f"invalid_{col.replace(' ', '_')}", col, data[col], f"not a number, defaults to {default}")
+
+    names, no_name = style_numbers(data)
+    report(no_name, "missing_output_name", "Style Number", names, "no Style Number or MPN to name the JPG")
+
+    # Among rows that render, every earlier row with a repeated name is overwritten by the last one
+    rendered_names = names[renderable]
+    overwritten = np.flatnonzero(renderable)[rendered_names.duplicated(keep="last").to_numpy()]
+    winner = pd.Series(rendered_names.index, index=rendered_names.to_numpy())
+    winner = winner[~winner.index.duplicated(keep="last")]
+    duplicate = np.zeros(len(data), dtype=bool)
+    duplicate[overwritten] = True
+    detail = np.full(len(data), "", dtype=object)
+    detail[overwritten] = [f"overwritten by row {winner[name]}" for name in names.iloc[overwritten]]
+    report(duplicate, "duplicate_output_name", "Style Number", names, detail)
+
+    return _report(len(data), int(renderable.sum()), issues)
+
+def _report(rows, renderable, issues):
+    columns = ["row", "problem", "column", "value", "detail"]
+    issues = pd.concat(issues, ignore_index=True) if issues else pd.DataFrame(columns=columns)
+    return {
+        "rows": rows,
+        "renderable": renderable,
+        "counts": issues["problem"].value_counts().to_dict(),
+        "issues": issues.sort_values(["row", "problem"], kind="stable", ignore_index=True),
+    }
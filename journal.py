@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+
+#Append-only checkpoint journal for long csv_pipeline runs.
+#
+#<run>.journal.jsonl holds one JSON object per line:
+#  {"type": "run", ...}      start of a (re)run: settings and number of jobs
+#  {"type": "missing", ...}  the missing garments / graphics for that run
+#  {"type": "done", ...}     a finished row: sheet row, ZIP name, input hash, part file
+#Rendered rows are kept as <run>.parts/<input hash>.jpg until the journal is deleted.
+
+# Rows between fsyncs of the journal (every line is flushed)
+FSYNC_EVERY = 100
+
+def journal_paths(zip_path):
+    """
+    Journal file and parts folder that belong to a ZIP path.
+    """
+    base = os.path.splitext(os.fspath(zip_path))[0]
+    return f"{base}.journal.jsonl", f"{base}.parts"
+
+def job_hash(job, settings):
+    """
+    Hash of everything that decides a row's output: the job fields, the render
+    settings and the size/mtime of both source PNGs.
+    """
+    payload = {key: job[key] for key in ("graphic_path", "garment_path", "width", "style_number", "x_coord", "y_coord")}
+    for key in ("graphic_path", "garment_path"):
+        source = os.stat(job[key])
+        payload[key + "_stat"] = (source.st_size, source.st_mtime_ns)
+    payload["settings"] = settings
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+def read_journal(journal_path):
+    """
+    Return the journal's lines as dicts; a torn line from a crash mid-write is skipped.
+    """
+    entries = []
+    if not os.path.exists(journal_path):
+        return entries
+    with open(journal_path, "r", encoding="utf-8") as journal_file:
+        for line in journal_file:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+class RunJournal:
+    """
+    Checkpoint journal for one output ZIP. completed() maps input hashes from
+    earlier (possibly crashed) runs to part files that still exist.
+    """
+    def __init__(self, journal_path, parts_dir):
+        self.journal_path = journal_path
+        self.parts_dir = parts_dir
+        os.makedirs(parts_dir, exist_ok=True)
+        self._completed = {}
+        for entry in read_journal(journal_path):
+            if entry.get("type") == "done" and os.path.exists(os.path.join(parts_dir, entry["part"])):
+                self._completed[entry["hash"]] = entry["part"]
+        self._file = open(journal_path, "a+", encoding="utf-8")
+        self._unsynced = 0
+        # Start on a fresh line if the last run died halfway through writing one
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+
+    @classmethod
+    def for_zip(cls, zip_path):
+        return cls(*journal_paths(zip_path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def completed(self, input_hash):
+        return input_hash in self._completed
+
+    def read_part(self, input_hash):
+        with open(os.path.join(self.parts_dir, self._completed[input_hash]), "rb") as part_file:
+            return part_file.read()
+
+    def _append(self, entry, sync=False):
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if sync or self._unsynced >= FSYNC_EVERY:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def start_run(self, jobs, settings):
+        self._append({"type": "run", "jobs": jobs, "settings": settings}, sync=True)
+
+    def record_missing(self, missing_garments, missing_graphics):
+        self._append({"type": "missing", "garments": missing_garments, "graphics": missing_graphics}, sync=True)
+
+    def record_done(self, job, input_hash, jpg_bytes=None):
+        """
+        Journal a finished row. New renders are written to a part file first
+        (atomically), rows reused from an earlier run just get a new line.
+        """
+        part = f"{input_hash}.jpg"
+        if jpg_bytes is not None and input_hash not in self._completed:
+            part_path = os.path.join(self.parts_dir, part)
+            with open(part_path + ".tmp", "wb") as part_file:
+                part_file.write(jpg_bytes)
+            os.replace(part_path + ".tmp", part_path)
+            self._completed[input_hash] = part
+        self._append({
+            "type": "done",
+            "row": int(job["row_index"]),
+            "name": f"{job['style_number']}.jpg",
+            "hash": input_hash,
+            "part": part,
+        })
+
+    def close(self):
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+def latest_run(journal_path):
+    """
+    Return (run entry, {sheet row: done entry}, missing entry) for the last run
+    in the journal.
+    """
+    entries = read_journal(journal_path)
+    run_starts = [i for i, entry in enumerate(entries) if entry.get("type") == "run"]
+    if not run_starts:
+        raise FileNotFoundError(f"No journaled run found in {journal_path}")
+
+    done = {}
+    missing = {"garments": [], "graphics": []}
+    for entry in entries[run_starts[-1] + 1:]:
+        if entry.get("type") == "done":
+            done[entry["row"]] = entry
+        elif entry.get("type") == "missing":
+            missing = entry
+    return entries[run_starts[-1]], done, missing
@@ -0,0 +1,98 @@
+import os
+import sys
+from collections import deque
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+#Memory budgets for render runs: per-job footprint estimates from asset dimensions,
+#an in-order executor map that keeps the estimated bytes of in-flight jobs under a
+#budget, and peak RSS of the run.
+
+MB = 1024 * 1024
+
+# Resident size of a render process before it holds any asset (interpreter, numpy, OpenCV, Pillow)
+PROCESS_BASE_BYTES = 100 * MB
+
+# Bytes per garment pixel held by a DecodedGarment (RGBA + BGR + alpha) and by its
+# light map planes (uint8 gray + float32 blurred light)
+GARMENT_BYTES_PER_PIXEL = 8
+LIGHT_PLANE_BYTES_PER_PIXEL = 5
+
+# Transient bytes per garment pixel while a row renders: the BGR frame, Pillow's
+# 4-byte RGB copy for the JPEG encoder and the encoded JPEG (bounded by 1 byte/pixel)
+FRAME_BYTES_PER_PIXEL = 8
+
+# Bytes per logo pixel: resized premultiplied BGR + alpha, plus with the light map
+# the float32 light crop and blend_light_map's uint8 result (its float temporaries
+# are per row strip, under PROCESS_BASE_BYTES' slack)
+LOGO_BYTES_PER_PIXEL = 4
+LIGHT_BLEND_BYTES_PER_PIXEL = 7
+
+def garment_footprint(width, height, apply_light_map=False):
+    """
+    Bytes of one decoded garment (as cached or shared).
+    """
+    per_pixel = GARMENT_BYTES_PER_PIXEL + (LIGHT_PLANE_BYTES_PER_PIXEL if apply_light_map else 0)
+    return width * height * per_pixel
+
+def job_footprint(garment_size, logo_size, apply_light_map=False):
+    """
+    Transient bytes of rendering one row (garment_size and logo_size are (width, height)),
+    on top of the decoded garment and design.
+    """
+    garment_w, garment_h = garment_size
+    logo_w, logo_h = logo_size
+    per_logo_pixel = LOGO_BYTES_PER_PIXEL + (LIGHT_BLEND_BYTES_PER_PIXEL if apply_light_map else 0)
+    return garment_w * garment_h * FRAME_BYTES_PER_PIXEL + logo_w * logo_h * per_logo_pixel
+
+def budgeted_map(executor, fn, items, footprint, budget_bytes, max_in_flight):
+    """
+    executor.map() that yields fn(item) in submission order, but submits an
+    item only while at most max_in_flight items are pending and the
+    footprint() of the pending items fits in budget_bytes. An item larger
+    than the budget still runs, alone.
+    """
+    pending = deque()
+    in_flight = 0
+    for item in items:
+        nbytes = footprint(item)
+        while pending and (len(pending) >= max_in_flight or in_flight + nbytes > budget_bytes):
+            future, done_bytes = pending.popleft()
+            in_flight -= done_bytes
+            yield future.result()
+        pending.append((executor.submit(fn, item), nbytes))
+        in_flight += nbytes
+    while pending:
+        yield pending.popleft()[0].result()
+
+def reset_peak_rss():
+    """
+    Restart this process's peak RSS from its current RSS (Linux only; elsewhere
+    peak_rss_bytes() stays the peak since the process started). Returns True if reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process in bytes, or None if it cannot be read.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # kB on Linux
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process(os.getpid()).memory_info()
+    return getattr(memory, "peak_wset", memory.rss)
+
+def rss_mb(nbytes):
+    return None if nbytes is None else round(nbytes / MB, 1)
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+
+#Persistent, content-addressed cache of encoded renders (JPG/PNG) shared across runs.
+#Entries live in <cache dir>/<first 2 hex chars>/<key>.<format>; the file mtime is the
+#last use, so the least recently used entries are deleted once the size budget is hit.
+
+# Digests of source files, keyed by (path, size, mtime) so each file is hashed once per process
+_file_digests = {}
+
+def bytes_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def file_digest(path):
+    """
+    SHA-256 of a file's bytes, memoized until the file's size or mtime changes.
+    """
+    source = os.stat(path)
+    memo_key = (os.path.abspath(path), source.st_size, source.st_mtime_ns)
+    digest = _file_digests.get(memo_key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as source_file:
+            for block in iter(lambda: source_file.read(1024 * 1024), b""):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+        _file_digests[memo_key] = digest
+    return digest
+
+class RenderCache:
+    """
+    On-disk render cache with LRU eviction by total size.
+
+    key() hashes whatever decides a render (asset digests, size, position,
+    light-map settings, output format); get() returns the encoded bytes or None.
+    """
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.nbytes = sum(size for _, _, size in self._entries())
+        if self.nbytes > self.max_bytes:
+            self.evict()
+
+    @staticmethod
+    def key(**inputs):
+        encoded = json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key, fmt):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{fmt}")
+
+    def _entries(self):
+        """
+        (path, last use, size) for every cached file.
+        """
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    info = entry.stat()
+                    yield entry.path, info.st_mtime, info.st_size
+
+    def get(self, key, fmt="jpg"):
+        path = self._path(key, fmt)
+        try:
+            with open(path, "rb") as cached_file:
+                data = cached_file.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        os.utime(path)  # Mark as recently used
+        self.hits += 1
+        return data
+
+    def put(self, key, data, fmt="jpg"):
+        path = self._path(key, fmt)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as cached_file:
+            cached_file.write(data)
+        os.replace(path + ".tmp", path)
+        self.nbytes += len(data)
+        if self.nbytes > self.max_bytes:
+            self.evict()
+
+    def evict(self, target_fraction=0.9):
+        """
+        Delete least recently used entries until the cache is under
+        target_fraction of its budget (so eviction does not run on every put).
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self.nbytes = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if self.nbytes <= self.max_bytes * target_fraction:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.nbytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.nbytes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
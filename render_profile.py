@@ -0,0 +1,109 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
+
+#Per-stage wall time and byte counts for render runs (csv_pipeline.py, batch_combiner.py).
+#Each row gets a RowTimer (picklable, so pool workers send it back with the JPG);
+#RenderProfile collects them and reports totals, p50/p95 per stage and the slowest rows.
+
+# Stages in render order: PNG decode, design resize, light map + blend, alpha mask /
+# flatten onto white, JPEG/PNG encode and ZIP writes
+STAGES = ("decode", "resize", "blend", "mask", "encode", "zip")
+
+class RowTimer:
+    """
+    Seconds and bytes per stage for one row.
+    """
+    def __init__(self):
+        self.seconds = {}
+        self.bytes = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, nbytes):
+        self.bytes[name] = self.bytes.get(name, 0) + int(nbytes)
+
+    @property
+    def total(self):
+        return sum(self.seconds.values())
+
+class RenderProfile:
+    """
+    Stage timings of every row of a run. add() takes the row's id (sheet row
+    or file name), its output name, where the result came from ("render",
+    "render_cache", "journal") and its RowTimer.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._rows = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, row, name, timer, source="render"):
+        self._rows.append((row, name, source, timer))
+
+    def report(self, slowest=10):
+        """
+        JSON-ready dict: wall time, per-stage totals / bytes / p50 / p95 / max
+        (over the rows that went through the stage) and the slowest rows.
+        """
+        stages = {}
+        names = list(STAGES) + sorted({stage for *_, timer in self._rows for stage in timer.seconds} - set(STAGES))
+        for stage in names:
+            seconds = np.array([timer.seconds[stage] for *_, timer in self._rows if stage in timer.seconds])
+            if not len(seconds):
+                continue
+            stages[stage] = {
+                "rows": len(seconds),
+                "seconds": round(float(seconds.sum()), 4),
+                "bytes": sum(timer.bytes.get(stage, 0) for *_, timer in self._rows),
+                "p50_ms": round(float(np.percentile(seconds, 50)) * 1000, 3),
+                "p95_ms": round(float(np.percentile(seconds, 95)) * 1000, 3),
+                "max_ms": round(float(seconds.max()) * 1000, 3),
+            }
+
+        by_time = sorted(self._rows, key=lambda entry: entry[3].total, reverse=True)[:slowest]
+        return {
+            "rows": len(self._rows),
+            "wall_seconds": round(time.perf_counter() - self.started, 4),
+            "stages": stages,
+            "slowest_rows": [
+                {"row": row, "name": name, "source": source, "total_ms": round(timer.total * 1000, 3),
+                 "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in timer.seconds.items()}}
+                for row, name, source, timer in by_time
+            ],
+        }
+
+    def write(self, path, slowest=10):
+        """
+        Write report() as JSON (atomically) and return it.
+        """
+        report = self.report(slowest)
+        with open(path + ".tmp", "w", encoding="utf-8") as profile_file:
+            json.dump(report, profile_file, indent=2, default=str)
+        os.replace(path + ".tmp", path)
+        return report
+
+def stage_rows(report):
+    """
+    One dict per stage of a report(), for a results table (st.dataframe).
+    """
+    return [{"stage": stage, "rows": totals["rows"], "seconds": totals["seconds"],
+             "MB": round(totals["bytes"] / 1024 / 1024, 2), "p50 ms": totals["p50_ms"],
+             "p95 ms": totals["p95_ms"], "max ms": totals["max_ms"]}
+            for stage, totals in report["stages"].items()]
+
+def profile_path(zip_path):
+    """
+    Profile JSON that belongs to a ZIP path.
+    """
+    return f"{os.path.splitext(os.fspath(zip_path))[0]}.profile.json"
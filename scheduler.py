@@ -0,0 +1,54 @@
+from asset_cache import LRUCache
+
+#Reorders csv_pipeline render jobs so rows sharing a garment / design run back to back
+
+# Cache key helpers for a render job
+def garment_key(job):
+    return job["garment_path"]
+
+def graphic_key(job):
+    return (job["graphic_path"], job["width"])
+
+def schedule_jobs(jobs):
+    """
+    Return the jobs grouped by garment, then by (design, width).
+
+    Groups keep the order in which they first appear in the sheet and rows keep
+    their sheet order inside a group, so the schedule is deterministic.
+    """
+    first_garment = {}
+    first_graphic = {}
+    for position, job in enumerate(jobs):
+        first_garment.setdefault(garment_key(job), position)
+        first_graphic.setdefault((garment_key(job), graphic_key(job)), position)
+
+    def sort_key(item):
+        position, job = item
+        return (first_garment[garment_key(job)], first_graphic[(garment_key(job), graphic_key(job))], position)
+
+    return [job for _, job in sorted(enumerate(jobs), key=sort_key)]
+
+def simulate_hit_rate(jobs, key, max_entries):
+    """
+    Replay the jobs through an LRU of max_entries and return its hit rate.
+    """
+    cache = LRUCache(max_entries=max_entries)
+    for job in jobs:
+        if cache.get(key(job)) is None:
+            cache.put(key(job), True)
+    return cache.stats()["hit_rate"]
+
+def reuse_report(jobs, scheduled, garment_entries=16, graphic_entries=32):
+    """
+    Simulated garment and graphic cache hit rates for sheet order vs the schedule.
+    """
+    return {
+        "garment_hit_rate": {
+            "csv_order": simulate_hit_rate(jobs, garment_key, garment_entries),
+            "scheduled": simulate_hit_rate(scheduled, garment_key, garment_entries),
+        },
+        "graphic_hit_rate": {
+            "csv_order": simulate_hit_rate(jobs, graphic_key, graphic_entries),
+            "scheduled": simulate_hit_rate(scheduled, graphic_key, graphic_entries),
+        },
+    }
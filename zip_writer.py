@@ -0,0 +1,83 @@
+import os
+import zipfile
+
+#Streaming ZIP writer for csv_pipeline output: entries go straight to disk,
+#already-compressed images are STORED, and big runs can be split into volumes.
+
+# Entries with these extensions are already compressed, deflating them only costs CPU
+STORED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".zip")
+
+# Local header + central directory record + data descriptor, with ZIP64 extras
+ENTRY_OVERHEAD = 30 + 46 + 24 + 2 * 28
+
+def volume_path(path, number):
+    """
+    Name of volume `number` (1-based): "run.zip", "run.part002.zip", ...
+    """
+    if number == 1:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}.part{number:03d}{ext or '.zip'}"
+
+class StreamingZipWriter:
+    """
+    Append entries to a ZIP on disk (or any writable file object) as they are produced.
+
+    ZIP64 is always allowed, so archives over 4 GB or 65,535 entries are fine.
+    With max_volume_bytes (path targets only) the output rolls over to a new,
+    self-contained ZIP volume before an entry would push the current one past
+    the limit; `volumes` lists the files written.
+    """
+    def __init__(self, target, max_volume_bytes=None):
+        if max_volume_bytes and not isinstance(target, (str, os.PathLike)):
+            raise ValueError("Splitting into volumes needs a file path target")
+        self.target = target
+        self.max_volume_bytes = max_volume_bytes
+        self.volumes = []
+        self.entries = 0
+        self.bytes_written = 0
+        self._zip = None
+        self._volume_bytes = 0
+        self._open_volume()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _open_volume(self):
+        if isinstance(self.target, (str, os.PathLike)):
+            path = volume_path(os.fspath(self.target), len(self.volumes) + 1)
+            self.volumes.append(path)
+            self._zip = zipfile.ZipFile(path, "w", allowZip64=True)
+        else:
+            self._zip = zipfile.ZipFile(self.target, "w", allowZip64=True)
+        self._volume_bytes = 0
+
+    def write(self, name, data):
+        """
+        Add one entry. Images are STORED, everything else is DEFLATED.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if name.lower().endswith(STORED_EXTENSIONS):
+            compress_type = zipfile.ZIP_STORED
+        else:
+            compress_type = zipfile.ZIP_DEFLATED
+
+        entry_bytes = len(data) + len(name.encode("utf-8")) * 2 + ENTRY_OVERHEAD
+        if (self.max_volume_bytes and self._volume_bytes
+                and self._volume_bytes + entry_bytes > self.max_volume_bytes):
+            self._zip.close()
+            self._open_volume()
+
+        self._zip.writestr(name, data, compress_type=compress_type)
+        self._volume_bytes += entry_bytes
+        self.bytes_written += len(data)
+        self.entries += 1
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None